@@ -1,28 +1,102 @@
+import threading
 import streamlit as st
-import google.generativeai as genai
-from utils import generate_docx, update_sheet
+from concurrent.futures import ThreadPoolExecutor
+from utils import generate_docx, update_sheet, build_tracking_rows, fetch_tracking_rows, SPREADSHEET_NAME, WORKSHEET_NAME
+from clients import warm_up
+import core
+from core import (
+    MODEL_PRO, MODEL_FLASH,
+    get_award_rule_text, get_word_limit, build_prompt, build_redo_prompt, build_entry, merge_export_entries
+)
 from datetime import datetime
-from awards import format_examples_for_prompt, get_citation_examples
+from streamlit.errors import StreamlitSecretNotFoundError
+from history import VersionHistory, SUBJECT_FIELDS
+from store import SessionStore
+from shared_state import open_shared_state
+from ingest import ingest
+from profiling import ProfileSession
+from nominee_index import NomineeIndex
+from fallback import build_fallback_justification
 
 
 # ============================================================================
-# CONFIGURATION SECTION - Edit API model versions here if needed
+# CONFIGURATION SECTION - Model versions, word limits and prompts live in core.py
 # ============================================================================
 st.set_page_config(layout="wide", page_title="SAFAISA Award Vetter")
 
-MODEL_PRO = 'gemini-2.5-pro'      # Primary model for complex logic
-MODEL_FLASH = 'gemini-2.5-flash'  # Fallback model for speed
+# ============================================================================
+# VERSION HISTORY CONFIGURATION
+# ============================================================================
+HISTORY_MAX_VERSIONS_PER_NOMINEE = 10  # Older versions of a nominee are dropped
+HISTORY_MAX_NOMINEES = 25              # Least recently used nominees are evicted
+HISTORY_DELTA_ENCODING = True          # Store regenerations as edits of the previous version
+
+# ============================================================================
+# PERSISTENCE CONFIGURATION (opt-in)
+# ============================================================================
+PERSISTENCE_ENABLED = False                  # Save versions and batches per user across restarts
+PERSISTENCE_DB_PATH = "safaisa_sessions.db"  # Local SQLite file (WAL mode)
 
 # ============================================================================
-# AWARD RULES CONFIGURATION
+# SHARED STATE CONFIGURATION - for several app processes behind one URL
+# ============================================================================
+# Response cache, model quota buckets and the tracking sheet write queue.
+# "memory://" keeps them per process (one replica). "sqlite:///safaisa_shared.db"
+# shares them between processes on one host; with persistence on, versions
+# and batches are kept in the same file (PERSISTENCE_DB_PATH is then unused).
+SHARED_STATE_URL = "memory://"
+
+# ============================================================================
+# STARTUP CONFIGURATION
+# ============================================================================
+BACKGROUND_WARM_UP = True  # Build Gemini/Sheets clients in the background after login
+LOGO_FILE = "logo_small.png"  # 100 px copy of logo.png (2x the sidebar width), served as-is
+
 # ============================================================================
-AWARD_WORD_LIMITS = {
-    "CO Coin": 110,
-    "RSM Coin": 110,
-    "CTO Coin": 100,    # Edit word limit here
-    "FSM Coin": 100,    # Edit word limit here
-    "BSOM": 180,
-}
+# NOMINEE LOOKUP CONFIGURATION - suggestions from the tracking sheet while typing a name
+# ============================================================================
+NOMINEE_LOOKUP_ENABLED = True
+NOMINEE_INDEX_REFRESH_SECONDS = 300        # New sheet rows are fetched at most this often
+NOMINEE_INDEX_FULL_RELOAD_SECONDS = 3600   # Full reload (picks up edited / deleted rows)
+# Statuses whose awards are not counted as received (NOMINATED = still pending, as written on accept)
+NOMINEE_INDEX_EXCLUDE_STATUSES = ("NOMINATED", "REJECTED", "NOT APPROVED", "CANCELLED")
+NOMINEE_SUGGESTIONS = 3                    # Matches shown under the name field
+
+# ============================================================================
+# OFFLINE FALLBACK CONFIGURATION - a local draft when the AI model is down or slow
+# ============================================================================
+FALLBACK_ENABLED = True
+FALLBACK_AFTER_SECONDS = 25               # Show the local draft if the model has not answered by then
+FALLBACK_RETRY_DELAYS = (5, 15, 30, 60)   # Background retries after a failed call (seconds apart)
+FALLBACK_POLL_SECONDS = 2                 # How often the page checks for the model's late answer
+FALLBACK_WORKERS = 8                      # Background generation threads per process
+
+# ============================================================================
+# PROFILING CONFIGURATION - admins log in with ADMIN_PASSWORD from secrets.toml
+# ============================================================================
+PROFILING_KEEP = 5  # Captured profiles kept per session
+
+# ============================================================================
+# FORM OPTIONS
+# ============================================================================
+AWARD_TYPES = ["CO Coin", "RSM Coin", "CTO Coin", "FSM Coin", "BSOM", "OTHER"]
+ROLES = [
+    "Transport Operator (TO)",
+    "Transport Supervisor",
+    "Transport Leader",
+    "Platoon Commander",
+    "Others"
+]
+COMPANIES = [
+    "Alpha COY",
+    "Khatib Node",
+    "Charlie COY",
+    "HQ COY",
+    "Kranji Node",
+    "Mandai Hill Node",
+    "Light Transport COY",
+    "Combat Sustainment COY"
+]
 # ============================================================================
 
 # --- CSS STYLING ---
@@ -114,7 +188,11 @@ st.markdown("""
 
 # --- STATE MANAGEMENT ---
 if "history" not in st.session_state:
-    st.session_state.history = []
+    st.session_state.history = VersionHistory(
+        max_versions_per_nominee=HISTORY_MAX_VERSIONS_PER_NOMINEE,
+        max_nominees=HISTORY_MAX_NOMINEES,
+        delta_encoding=HISTORY_DELTA_ENCODING
+    )
 if "curr_idx" not in st.session_state:
     st.session_state.curr_idx = -1
 if "batch_list" not in st.session_state:
@@ -125,8 +203,25 @@ if "current_month" not in st.session_state:
     st.session_state.current_month = ""
 if "current_unit" not in st.session_state:
     st.session_state.current_unit = ""
+if "pending_nominations" not in st.session_state:
+    st.session_state.pending_nominations = []
+if "is_admin" not in st.session_state:
+    st.session_state.is_admin = False
+if "profiler" not in st.session_state:
+    st.session_state.profiler = ProfileSession(keep=PROFILING_KEEP)
+if "fallback_vids" not in st.session_state:
+    st.session_state.fallback_vids = set()
+if "pending_model" not in st.session_state:
+    st.session_state.pending_model = None
 
 # --- CALLBACKS ---
+def get_secret(name):
+    """Returns a value from secrets.toml, or None if it (or the whole file) is missing"""
+    try:
+        return st.secrets.get(name)
+    except StreamlitSecretNotFoundError:
+        return None
+
 def clear_form_callback():
     """Clears input widgets safely using callback"""
     keys_to_clear = [
@@ -143,27 +238,388 @@ def sync_text_callback(field_type):
     idx = st.session_state.curr_idx
     if idx >= 0:
         if field_type == "brief":
-            st.session_state.history[idx]["brief"] = st.session_state[f"brief_box_{idx}"]
+            vid = st.session_state.history.get(idx)["vid"]
+            st.session_state.history.set_text(idx, st.session_state[f"brief_box_{vid}"])
+            
+            store = session_store()
+            if store:
+                store.update_version_text(st.session_state.user, vid, st.session_state[f"brief_box_{vid}"])
+
+# --- PERSISTENCE ---
+@st.cache_resource
+def get_shared_state():
+    """Opens the shared state backend once per process and hands it to the AI engine"""
+    state = open_shared_state(SHARED_STATE_URL)
+    core.set_shared_state(state)
+    return state
+
+@st.cache_resource
+def get_store():
+    """Opens the SQLite store once per process (the shared one when replicas share state)"""
+    state = get_shared_state()
+    if isinstance(state, SessionStore):
+        return state
+    return SessionStore(PERSISTENCE_DB_PATH)
+
+def session_store():
+    """Returns the persistence store for the logged-in user, or None when persistence is off"""
+    if not PERSISTENCE_ENABLED or not st.session_state.get("user"):
+        return None
+    return get_store()
+
+def add_version(subject, text):
+    """Appends a version to history (and the store) and makes it current"""
+    subject = {field: subject.get(field, "") for field in SUBJECT_FIELDS}
+    vid = None
+    store = session_store()
+    if store:
+        vid = store.add_version(st.session_state.user, subject, text)
+    st.session_state.curr_idx = st.session_state.history.append(subject, text, vid=vid)
+
+def add_to_batch(entry):
+    """Adds an accepted entry to the export batch (and the store)"""
+    st.session_state.batch_list.append(entry)
+    store = session_store()
+    if store:
+        store.add_batch_entry(st.session_state.user, entry)
+
+def clear_batch():
+    """Empties the export batch (and the store)"""
+    st.session_state.batch_list = []
+    store = session_store()
+    if store:
+        store.clear_batch(st.session_state.user)
+
+def restore_session():
+    """Reloads the logged-in user's saved versions and batch after login"""
+    store = session_store()
+    if not store:
+        return
+    
+    user = st.session_state.user
+    keep = HISTORY_MAX_VERSIONS_PER_NOMINEE * HISTORY_MAX_NOMINEES
+    store.prune_versions(user, keep)
+    
+    history = st.session_state.history
+    history.clear()
+    for vid, subject, text in store.load_versions(user, keep):
+        history.append(subject, text, vid=vid)
+    st.session_state.curr_idx = len(history) - 1
+    st.session_state.batch_list = store.load_batch(user)
+
+def dismiss_export_callback():
+    """Drops the exported document once it has been downloaded"""
+    st.session_state.export_doc = None
+
+def step_version_callback(step):
+    """Moves between versions before the output panel re-renders (no extra rerun)"""
+    st.session_state.curr_idx += step
+
+def load_pending_callback(nomination_id):
+    """Fills the input form from an imported nomination and takes it off the queue"""
+    pending = st.session_state.pending_nominations
+    nomination = next((n for n in pending if n["id"] == nomination_id), None)
+    if not nomination:
+        return
+    st.session_state.pending_nominations = [n for n in pending if n["id"] != nomination_id]
+    
+    clear_form_callback()
+    if nomination["award"] in AWARD_TYPES:
+        st.session_state.i_award = nomination["award"]
+    elif nomination["award"]:
+        st.session_state.i_award = "OTHER"
+        st.session_state.i_award_name = nomination["award"]
+    if nomination["role"] in ROLES:
+        st.session_state.i_role = nomination["role"]
+    elif nomination["role"]:
+        st.session_state.i_role = "Others"
+        st.session_state.i_role_man = nomination["role"]
+    unit = next((c for c in COMPANIES if c.lower() == nomination["unit"].lower()), None)
+    if unit:
+        st.session_state.i_unit = unit
+    
+    st.session_state.i_rank = nomination["rank"]
+    st.session_state.i_fname = nomination["name"]
+    st.session_state.i_lname = nomination["preferred_name"] or nomination["name"].split(" ")[-1]
+    st.session_state.i_draft = nomination["draft"]
+    for field in ("ippt", "bmi", "atp", "previous_awards"):
+        st.session_state[f"i_{field}"] = nomination[field]
+
+def remove_pending_callback(nomination_id):
+    """Drops an imported nomination from the queue"""
+    st.session_state.pending_nominations = [
+        n for n in st.session_state.pending_nominations if n["id"] != nomination_id
+    ]
+
+def import_documents(files):
+    """Parses uploaded .docx / .zip files into the pending queue, returning (added, errors)"""
+    known = {n["id"] for n in st.session_state.pending_nominations}
+    added, errors = 0, []
+    progress = st.progress(0.0, text="Reading documents...")
+    
+    for count, nomination in enumerate(ingest((f.name, f) for f in files), start=1):
+        progress.progress(min(1.0, count / max(len(files), count)), text=f"Read {count} documents")
+        if nomination.get("error"):
+            errors.append(f"{nomination['source']}: {nomination['error']}")
+        elif nomination["id"] not in known:
+            known.add(nomination["id"])
+            st.session_state.pending_nominations.append(nomination)
+            added += 1
+    
+    progress.empty()
+    return added, errors
 
 # --- AI ENGINE ---
-def call_gemini(prompt):
-    """Calls Gemini API with fallback support"""
-    if "GEMINI_API_KEY" not in st.secrets:
+def call_gemini(prompt, **routing):
+    """Calls Gemini API with fallback support (routing: award, word_limit, draft_words)"""
+    api_key = get_secret("GEMINI_API_KEY")
+    if not api_key:
         return "Error: API Key missing in secrets.toml"
     
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+    return core.call_gemini(prompt, api_key, **routing)
+
+def generate_first_version(subject, prompt, fallback, **routing):
+    """
+    Generates a nominee's first version and keeps it as the active regeneration session.
+    
+    If the model fails or has not answered within FALLBACK_AFTER_SECONDS, a
+    local draft is returned instead and the model keeps trying in the
+    background; watch_model_result swaps its answer in when it arrives.
     
+    Args:
+        subject (dict): Nominee metadata
+        prompt (str): Generation prompt
+        fallback (dict): Arguments for build_fallback_justification
+        **routing: award, word_limit, draft_words
+    
+    Returns:
+        tuple: (text, background job or None, True if text is the local fallback)
+    """
+    # Moving to a new nominee evicts the previous nominee's session (and any late answer)
+    end_session()
+    api_key = get_secret("GEMINI_API_KEY")
+    if not api_key:
+        if FALLBACK_ENABLED:
+            return build_fallback_justification(**fallback), None, True
+        return "Error: API Key missing in secrets.toml", None, False
+    
+    if not FALLBACK_ENABLED:
+        text, session = core.start_session(prompt, api_key, **routing)
+        st.session_state.gen_session = {"subject": subject_key(subject), "session": session} if session else None
+        return text, None, False
+    
+    pool = get_generation_pool()
+    job = {
+        "pool": pool, "prompt": prompt, "api_key": api_key, "routing": routing, "attempt": 0,
+        "first": [], "first_attempt": threading.Event(), "done": threading.Event(),
+        "cancel": threading.Event(), "result": None,
+    }
+    # All workers busy (many clerks during an outage): show the fallback without waiting in the queue
+    with pool["lock"]:
+        pool_full = pool["active"] >= FALLBACK_WORKERS
+    submit_model_attempt(job)
+    if not pool_full:
+        job["first_attempt"].wait(FALLBACK_AFTER_SECONDS)
+    
+    if job["first"] and job["first"][0][1]:
+        text, session = job["first"][0]
+        st.session_state.gen_session = {"subject": subject_key(subject), "session": session}
+        return text, None, False
+    return build_fallback_justification(**fallback), job, True
+
+def submit_model_attempt(job, delay=0):
+    """Queues the job's next model attempt, after delay seconds (a timer waits, not a worker)"""
+    if delay:
+        timer = threading.Timer(delay, submit_model_attempt, args=(job,))
+        timer.daemon = True
+        timer.start()
+        return
+    pool = job["pool"]
+    with pool["lock"]:
+        pool["active"] += 1
+    pool["executor"].submit(run_model_attempt, job)
+
+def run_model_attempt(job):
+    """One core.start_session call on a worker thread; schedules a retry after a failure"""
+    pool = job["pool"]
     try:
-        model = genai.GenerativeModel(MODEL_PRO)
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception:
-        try:
-            model = genai.GenerativeModel(MODEL_FLASH)
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"AI Error: {str(e)}"
+        if job["cancel"].is_set():
+            text, session = "AI Error: cancelled", None
+        else:
+            text, session = core.start_session(job["prompt"], job["api_key"], **job["routing"])
+    finally:
+        with pool["lock"]:
+            pool["active"] -= 1
+    
+    if not job["first"]:
+        job["first"].append((text, session))
+        job["first_attempt"].set()
+    if session or job["cancel"].is_set() or job["attempt"] >= len(FALLBACK_RETRY_DELAYS):
+        job["result"] = (text, session)
+        job["done"].set()
+        return
+    job["attempt"] += 1
+    submit_model_attempt(job, FALLBACK_RETRY_DELAYS[job["attempt"] - 1])
+
+@st.cache_resource
+def get_generation_pool():
+    """Worker threads for model calls that may outlive the script run (one pool per process)"""
+    return {
+        "executor": ThreadPoolExecutor(max_workers=FALLBACK_WORKERS, thread_name_prefix="generate"),
+        "lock": threading.Lock(),
+        "active": 0,  # Attempts queued or running
+    }
+
+def mark_fallback(subject, text, job):
+    """Flags the current version as the local fallback and, with a job, waits for the model's answer"""
+    vid = st.session_state.history.get(st.session_state.curr_idx)["vid"]
+    st.session_state.fallback_vids.add(vid)
+    if job:
+        st.session_state.pending_model = {"job": job, "vid": vid, "subject": subject, "text": text}
+
+def replace_fallback(pending, text, session):
+    """Puts the model's late answer in place of the fallback version (or after it, if the clerk edited it)"""
+    history = st.session_state.history
+    vid = pending["vid"]
+    pos = history.position(vid)
+    st.session_state.fallback_vids.discard(vid)
+    st.session_state.gen_session = {"subject": subject_key(pending["subject"]), "session": session}
+    
+    if pos is not None and history.get(pos)["brief"] == pending["text"]:
+        history.set_text(pos, text)
+        # The editor keeps its own copy of the text; drop it so the new text shows
+        st.session_state.pop(f"brief_box_{vid}", None)
+        store = session_store()
+        if store:
+            store.update_version_text(st.session_state.user, vid, text)
+    else:
+        add_version(pending["subject"], text)
+
+@st.fragment(run_every=FALLBACK_POLL_SECONDS)
+def watch_model_result():
+    """Polls for the model's answer to a fallback version (only rendered while one is pending)"""
+    pending = st.session_state.pending_model
+    if not pending or not pending["job"]["done"].is_set():
+        return
+    
+    st.session_state.pending_model = None
+    text, session = pending["job"]["result"]
+    if session:
+        replace_fallback(pending, text, session)
+    # Output panel shows the new text / banner; polling stops with this rerun
+    st.rerun()
+
+def regenerate_version(curr, instructions):
+    """Regenerates the current version, continuing the nominee's session when one is active"""
+    active = st.session_state.get("gen_session")
+    api_key = get_secret("GEMINI_API_KEY")
+    if active and active["subject"] == subject_key(curr) and api_key:
+        return core.continue_session(active["session"], instructions, curr["brief"], api_key)
+    
+    # No session for this nominee (e.g. an older nominee's version): stateless redo
+    return call_gemini(
+        build_redo_prompt(instructions, curr["brief"]),
+        award=curr["award"],
+        word_limit=get_word_limit(curr["award"]),
+        draft_words=len(curr["brief"].split())
+    )
+
+def end_session():
+    """Drops the active regeneration session and stops waiting for a late answer (after accept / export)"""
+    st.session_state.gen_session = None
+    pending = st.session_state.pending_model
+    if pending:
+        pending["job"]["cancel"].set()
+        st.session_state.pending_model = None
+
+def subject_key(record):
+    return tuple(record.get(field, "") for field in SUBJECT_FIELDS)
+
+@st.cache_resource
+def get_nominee_index():
+    """One fuzzy name index over the tracking sheet per process, shared by all sessions"""
+    return NomineeIndex(exclude_statuses=NOMINEE_INDEX_EXCLUDE_STATUSES)
+
+def refresh_nominee_index():
+    """Fetches new tracking rows in the background when the index is stale (never blocks)"""
+    # Secrets are read here, on the script thread, and handed to the worker
+    credentials = get_secret("gcp_service_account")
+    if not NOMINEE_LOOKUP_ENABLED or not credentials:
+        return
+    credentials = dict(credentials)
+    get_nominee_index().refresh_in_background(
+        lambda start_row: fetch_tracking_rows(credentials, start_row),
+        max_age=NOMINEE_INDEX_REFRESH_SECONDS,
+        full_reload_age=NOMINEE_INDEX_FULL_RELOAD_SECONDS
+    )
+
+def track_accepted(entries):
+    """Writes accepted entries to the tracking sheet and the local nominee index"""
+    update_sheet(entries, state=get_shared_state())
+    if NOMINEE_LOOKUP_ENABLED:
+        get_nominee_index().add_rows(build_tracking_rows(entries))
+
+def apply_nominee_callback(match):
+    """Fills name, unit, previous awards (and rank if empty) from a tracking sheet match"""
+    st.session_state.i_fname = match["name"]
+    st.session_state.i_previous_awards = match["previous_awards"]
+    if match["rank"] and not st.session_state.get("i_rank"):
+        st.session_state.i_rank = match["rank"]
+    unit = next((c for c in COMPANIES if c.lower() == match["unit"].lower()), None)
+    if unit:
+        st.session_state.i_unit = unit
+    st.session_state.nominee_applied = match["name"]
+
+@st.cache_resource
+def load_logo():
+    """Returns the small sidebar logo's bytes, read once per process (falls back to the original file)"""
+    try:
+        with open(LOGO_FILE, "rb") as f:
+            return f.read()
+    except OSError:
+        return "logo.png"
+
+def start_warm_up():
+    """Warms the model clients and sheet connection once per session, off the script thread"""
+    if not BACKGROUND_WARM_UP or st.session_state.get("warm_up_started"):
+        return
+    st.session_state.warm_up_started = True
+    
+    # Secrets are read here, on the script thread, and handed to the worker
+    api_key = get_secret("GEMINI_API_KEY")
+    credentials = get_secret("gcp_service_account")
+    if not api_key and not credentials:
+        return
+    warm_up(
+        api_key=api_key,
+        model_names=(MODEL_PRO, MODEL_FLASH),
+        credentials=credentials,
+        spreadsheet_name=SPREADSHEET_NAME,
+        worksheet_name=WORKSHEET_NAME
+    )
+
+def render_profiling_panel():
+    """Sidebar controls to profile the next runs / actions and download the results"""
+    profiler = st.session_state.profiler
+    with st.expander("🛠 Profiling"):
+        runs = st.number_input("Profile next N runs", min_value=0, max_value=20, value=0, key="prof_runs")
+        actions = st.multiselect("Profile next action", ["generate", "accept", "export"], key="prof_actions")
+        if st.button("Arm Profiler", use_container_width=True):
+            profiler.arm(runs=runs, actions=actions)
+        
+        if profiler.runs_left or profiler.actions:
+            st.caption(f"Armed: {profiler.runs_left} runs, actions: {', '.join(sorted(profiler.actions)) or 'none'}")
+        
+        for i, capture in enumerate(reversed(profiler.captures)):
+            st.markdown(f"**{capture['label']}** - {capture['wall_s']:.2f}s ({capture['time']})")
+            st.download_button(
+                "Download .prof",
+                data=capture["prof"],
+                file_name=f"safaisa_{capture['label'].split()[0]}_{capture['time']}.prof",
+                key=f"prof_dl_{capture['time']}_{i}",
+                use_container_width=True
+            )
+            st.code(capture["summary"], language=None)
 
 # --- LOGIN SCREEN ---
 if not st.session_state.authenticated:
@@ -171,16 +627,29 @@ if not st.session_state.authenticated:
     with c2:
         st.markdown("<h1 style='text-align: center;'>Award Vetter</h1>", unsafe_allow_html=True)
         st.markdown("<p style='text-align: center; color: grey;'>SAFAISA System</p>", unsafe_allow_html=True)
+        user = ""
+        if PERSISTENCE_ENABLED:
+            user = st.text_input("Username", placeholder="Used to restore your saved work").strip().upper()
         pwd = st.text_input("Enter Password", type="password", placeholder="Enter system password")
         if st.button("Login", use_container_width=True, type="primary"):
-            if pwd == "NSAF123":  #password
+            if PERSISTENCE_ENABLED and not user:
+                st.error("Please enter a username")
+            elif pwd == "NSAF123" or (pwd and pwd == get_secret("ADMIN_PASSWORD")):  #password
                 st.session_state.authenticated = True
+                st.session_state.is_admin = pwd != "NSAF123"
+                st.session_state.user = user
+                restore_session()
                 st.rerun()
             else:
                 st.error("Invalid Password")
     st.stop()
 
 # --- MAIN APP ---
+st.session_state.profiler.start_run()
+get_shared_state()
+start_warm_up()
+refresh_nominee_index()
+
 st.title("Award Vetter System")
 st.markdown("*SAFAISA - Award Justification Generator*")
 
@@ -189,7 +658,7 @@ with st.sidebar:
     # Logo and Header Section
     col1, col2 = st.columns([1, 3])
     with col1:
-        st.image("logo.png", width=50)
+        st.image(load_logo(), width=50)
     with col2:
         st.markdown("<h2 style='margin-top: 5px;'>SAFAISA</h2>", unsafe_allow_html=True)
 
@@ -218,63 +687,101 @@ with st.sidebar:
     if st.session_state.batch_list:
         st.metric("Batch Count", len(st.session_state.batch_list))
         if st.button("Clear Batch", use_container_width=True):
-            st.session_state.batch_list = []
+            clear_batch()
             st.rerun()
     
+    # Generation stats (process-wide, across all sessions)
+    with st.expander("Generation Stats"):
+        gen_metrics = core.get_generation_metrics()
+        m1, m2 = st.columns(2)
+        m1.metric("Model Calls", gen_metrics["upstream"])
+        m2.metric("Coalesced", gen_metrics["coalesced"], help="Duplicate requests served by an in-flight call")
+        if gen_metrics["cap_hits"]:
+            st.caption(f"{gen_metrics['cap_hits']} replies hit the output cap and were retried")
+        for model_name, model_stats in gen_metrics["models"].items():
+            if model_stats["samples"]:
+                st.caption(
+                    f"{model_name}: {model_stats['samples']} calls, "
+                    f"p50 {model_stats['p50_latency_s']:.1f}s, "
+                    f"{model_stats['compliance']:.0%} rule compliant"
+                )
+    
+    # Profiling (admins only)
+    if st.session_state.is_admin:
+        render_profiling_panel()
+    
     st.markdown("---")
     if st.button("🔓 Logout", use_container_width=True):
         st.session_state.authenticated = False
         st.rerun()
 
-# Main Layout
-left_col, right_col = st.columns(2)
-
 # ================= LEFT COLUMN: INPUTS =================
-with left_col:
+def render_bulk_import():
+    """Upload of unit .docx nominations (or a zip of them) into a pending queue"""
+    pending = st.session_state.pending_nominations
+    with st.expander(f"📂 Bulk Import ({len(pending)} pending)", expanded=bool(pending)):
+        files = st.file_uploader(
+            "Nomination documents",
+            type=["docx", "zip"],
+            accept_multiple_files=True,
+            key="i_import_files",
+            help="Word nominations from units, or a zip of them"
+        )
+        if st.button("Import Documents", use_container_width=True, disabled=not files):
+            added, errors = import_documents(files)
+            st.success(f"✓ Imported {added} nominations")
+            for error in errors:
+                st.warning(f"⚠️ {error}")
+        
+        for nomination in st.session_state.pending_nominations:
+            p1, p2, p3 = st.columns([4, 1, 1])
+            p1.markdown(
+                f"**{nomination['rank']} {nomination['name'] or '(no name)'}** - "
+                f"{nomination['award'] or '(no award)'}"
+            )
+            if nomination["warnings"]:
+                p1.caption(f"{nomination['source']} - check: {', '.join(nomination['warnings'])}")
+            else:
+                p1.caption(nomination["source"])
+            p2.button("Load", key=f"load_{nomination['id']}", on_click=load_pending_callback,
+                      args=(nomination["id"],), use_container_width=True)
+            p3.button("✕", key=f"remove_{nomination['id']}", on_click=remove_pending_callback,
+                      args=(nomination["id"],), use_container_width=True)
+
+@st.fragment
+def render_input_form():
+    """Input form - typing and field changes only rerun this fragment"""
+    render_bulk_import()
+    
     st.subheader("Input Details")
     
     # 1. Award Selection
     award = st.selectbox(
         "Award Type",
-        ["CO Coin", "RSM Coin", "CTO Coin", "FSM Coin", "BSOM", "OTHER"],
+        AWARD_TYPES,
+        key="i_award",
         help="Select the type of award to generate justification for"
     )
     
     # Dynamic Rules
     actual_award_name = award
-    award_rule_text = f"{AWARD_WORD_LIMITS.get(award, 160)} words"
+    award_rule_text = get_award_rule_text(award)
+    word_limit = get_word_limit(award)
     
     if award == "OTHER":
         actual_award_name = st.text_input("Award Name", key="i_award_name", placeholder="Enter custom award name")
         custom_rules = st.text_input("Word Limit", placeholder="e.g., 300 words", key="i_award_rules")
-        if custom_rules:
-            award_rule_text = custom_rules
+        award_rule_text = get_award_rule_text(award, custom_rules)
+        word_limit = get_word_limit(award, custom_rules)
 
     # 2. Role Selection
-    ROLES = [
-        "Transport Operator (TO)",
-        "Transport Supervisor",
-        "Transport Leader",
-        "Platoon Commander",
-        "Others"
-    ]
-    role_sel = st.selectbox("Serviceman Vocation", ROLES)
+    role_sel = st.selectbox("Serviceman Vocation", ROLES, key="i_role")
     actual_role = role_sel
     if role_sel == "Others":
         actual_role = st.text_input("Specify Vocation", key="i_role_man", placeholder="Enter Vocation manually")
 
     # 3. Unit & Person
-    COMPANIES = [
-        "Alpha COY",
-        "Khatib Node",
-        "Charlie COY",
-        "HQ COY",
-        "Kranji Node",
-        "Mandai Hill Node",
-        "Light Transport COY",
-        "Combat Sustainment COY"
-    ]
-    s_unit = st.selectbox("Company / Node", COMPANIES)
+    s_unit = st.selectbox("Company / Node", COMPANIES, key="i_unit")
     st.session_state.current_unit = s_unit  # Save for later use
     
     c1, c2, c3 = st.columns(3)
@@ -283,6 +790,23 @@ with left_col:
     s_lname = c3.text_input("Preferred / First Name", key="i_lname", placeholder="SMITH").upper()
     
     full_name_caps = f"{s_fname}".strip()
+    
+    # Matches from the tracking sheet (in-memory index - no API call while typing)
+    if NOMINEE_LOOKUP_ENABLED and len(full_name_caps) >= 3 and st.session_state.get("nominee_applied") != full_name_caps:
+        matches = get_nominee_index().search(
+            full_name_caps,
+            limit=NOMINEE_SUGGESTIONS,
+            exclude_award=(actual_award_name, st.session_state.current_month)
+        )
+        for match in matches:
+            details = " · ".join(filter(None, [match["unit"], match["previous_awards"] or "no previous awards"]))
+            st.button(
+                f"↳ {match['rank']} {match['name']} ({details})",
+                key=f"nominee_{match['name']}",
+                on_click=apply_nominee_callback,
+                args=(match,),
+                help="Fill unit and previous awards from the tracking sheet"
+            )
 
     # Month of Award Presentation
     MONTHS = [
@@ -339,51 +863,9 @@ with left_col:
         elif not s_rank or not full_name_caps:
             st.warning("⚠️ Please enter rank and name.")
         else:
-            with st.spinner("Processing with Gemini AI..."):
-                
-                # ============================================================================
-                # AI PROMPT CONFIGURATION - EDIT GENERATION RULES HERE
-                # ============================================================================
-                  # Get examples for this award type
-                examples_text = format_examples_for_prompt(actual_award_name)
- 
-                prompt_text = f"""
-Role: {actual_role}
-Unit: {s_unit}
-Award: {actual_award_name}
-Subject: {s_rank} {full_name_caps}
-
-INSTRUCTIONS:
-1. Tense: Use strictly Past or Present tense only
-2. Exercise Names: Remove ALL exercise names (e.g., Ex Wallaby, Ex Thunder) instead mention them as exercise or overseas exercise
-3. Opening Line: Start with 'Being a [appropriate adjective] {actual_role} from {s_unit}...'
-4. Name Usage: Use '{s_rank} {s_lname}'
-5. Length: Approximately {award_rule_text}
-6. Tone: Professional, formal military writing
-7. Focus: Highlight any two or three of the serviceman's specific achievements, leadership, primary and secondary duties, inspiration to peers, attitude, safety, punctuality and contributions depending on the context given by user
-8. Style: Match the format, structure, and tone of the examples below
-9. Formatting Rules:
-   - Do NOT use asterisks (*) for emphasis or highlighting
-   - Do NOT use bold, italics, or any special formatting
-   - Write in plain text only
-   - Do NOT end with recommendation phrases like "I recommend him", "he deserves", "worthy of this award", etc.
-   - End with the last achievement or quality statement
-10. Output: Provide ONLY the final justification text in plain text format with no explanations, no meta-commentary, no formatting marks
-
-{examples_text}
-DRAFT CONTENT:
-{main_draft}
-
-Generate the final award justification following all rules above. Remember: plain text only, no asterisks, no recommendation ending.
-"""
-                # ============================================================================
+            with st.session_state.profiler.action("generate"), st.spinner("Processing with Gemini AI..."):
                 
-                # Call AI for Brief
-                brief_out = call_gemini(prompt_text)
-                
-                # Save to History (including additional fields for CTO/FSM)
-                st.session_state.history.append({
-                    "brief": brief_out,
+                subject = {
                     "rank": s_rank,
                     "name": full_name_caps,
                     "award": actual_award_name,
@@ -393,27 +875,90 @@ Generate the final award justification following all rules above. Remember: plai
                     "bmi": bmi,
                     "atp": atp,
                     "previous_awards": previous_awards
-                })
-                st.session_state.curr_idx = len(st.session_state.history) - 1
+                }
+                
+                # Prompt rules are configured in core.build_prompt
+                prompt_text = build_prompt(
+                    award=actual_award_name,
+                    role=actual_role,
+                    unit=s_unit,
+                    rank=s_rank,
+                    full_name=full_name_caps,
+                    preferred_name=s_lname,
+                    award_rule_text=award_rule_text,
+                    draft=main_draft
+                )
+                
+                # Call AI for Brief (a local draft stands in if the model is down or slow)
+                brief_out, model_job, is_fallback = generate_first_version(
+                    subject,
+                    prompt_text,
+                    fallback={
+                        "award": actual_award_name,
+                        "role": actual_role,
+                        "unit": s_unit,
+                        "rank": s_rank,
+                        "preferred_name": s_lname,
+                        "draft": main_draft,
+                        "word_limit": word_limit
+                    },
+                    award=actual_award_name,
+                    word_limit=word_limit,
+                    draft_words=len(main_draft.split())
+                )
+                
+                # Save to History (including additional fields for CTO/FSM)
+                add_version(subject, brief_out)
+                if is_fallback:
+                    mark_fallback(subject, brief_out, model_job)
                 
+                # New version crosses into the output panel - rerun the whole app
                 st.rerun()
 
 # ================= RIGHT COLUMN: OUTPUTS =================
-with right_col:
+@st.fragment
+def render_output_panel():
+    """Output panel - editing, regenerating and version navigation only rerun this fragment"""
     st.subheader("📄 Generated Output")
 
     if st.session_state.curr_idx >= 0:
-        curr = st.session_state.history[st.session_state.curr_idx]
+        # --- REDO BRIEF ---
+        # Handled before the editor renders so the new version shows in the same fragment run
+        redo_requested = st.session_state.get("redo_brief", False)
+        redo_note_brief = st.session_state.get("i_redo_note", "")
+        if redo_requested and redo_note_brief:
+            curr = st.session_state.history.get(st.session_state.curr_idx)
+            with st.spinner("🔄 Regenerating brief..."):
+                # Only the new instruction is sent; rules and examples stay in the session
+                new_b = regenerate_version(curr, redo_note_brief)
+                
+            if core.is_error_text(new_b):
+                # Keep the current version rather than filing the error as one
+                st.error(new_b)
+            else:
+                # Append new version (subject metadata is shared, not copied)
+                add_version(curr, new_b)
+
+        curr = st.session_state.history.get(st.session_state.curr_idx)
         
         # --- BRIEFING WRITEUP ---
         st.markdown(f"**{curr['rank']} {curr['name']}** - *{curr['award']}*")
         
+        if curr["vid"] in st.session_state.fallback_vids:
+            pending = st.session_state.pending_model
+            if pending and pending["vid"] == curr["vid"]:
+                st.warning("⚡ Offline draft - assembled from your draft because the AI model is slow or "
+                           "unavailable. It will be replaced automatically when the model responds.")
+            else:
+                st.warning("⚡ Offline draft - the AI model could not be reached. Review and edit it, "
+                           "or use Regenerate once the model is back.")
+        
         # Editable Text Area with auto-save
         val_brief = st.text_area(
             "Justification",
             value=curr["brief"],
             height=250,
-            key=f"brief_box_{st.session_state.curr_idx}",
+            key=f"brief_box_{curr['vid']}",
             on_change=sync_text_callback,
             args=("brief",),
             help="Edit the text directly - changes are saved automatically"
@@ -424,54 +969,27 @@ with right_col:
         st.markdown(f"<p class='word-count'>Word count: {word_count_brief}</p>", unsafe_allow_html=True)
         
         # Redo Brief
-        redo_note_brief = st.text_input(
+        st.text_input(
             "Modification Instructions",
+            key="i_redo_note",
             placeholder="e.g., Make more humble, add more details such as..",
         )
-        if st.button("🔄 Regenerate Brief", key="redo_brief", use_container_width=True):
-            if redo_note_brief:
-                with st.spinner("🔄 Regenerating brief..."):
-                    # ============================================================================
-                    # REDO PROMPT - EDIT MODIFICATION RULES HERE
-                    # ============================================================================
-                    redo_prompt = f"""
-Rewrite the following text with these modifications: {redo_note_brief}
-
-Maintain the same structure and professionalism.
-Output ONLY the revised text, no explanations.
-
-Original Text:
-{val_brief}
-"""
-                    # ============================================================================
-                    new_b = call_gemini(redo_prompt)
-                    
-                    # Append new version
-                    st.session_state.history.append({
-                        "brief": new_b,
-                        "rank": curr["rank"],
-                        "name": curr["name"],
-                        "award": curr["award"],
-                        "unit": curr["unit"],
-                        "month": curr["month"],
-                        "ippt": curr.get("ippt", ""),
-                        "bmi": curr.get("bmi", ""),
-                        "atp": curr.get("atp", ""),
-                        "previous_awards": curr.get("previous_awards", "")
-                    })
-                    st.session_state.curr_idx += 1
-                    st.rerun()
-            else:
-                st.warning("Please enter modification instructions")
+        st.button("🔄 Regenerate Brief", key="redo_brief", use_container_width=True)
+        if redo_requested and not redo_note_brief:
+            st.warning("Please enter modification instructions")
 
         st.divider()
 
         # --- VERSION NAVIGATION ---
         col_prev, col_info, col_next = st.columns([1, 2, 1])
         
-        if col_prev.button("⬅️ Previous", use_container_width=True, disabled=(st.session_state.curr_idx == 0)):
-            st.session_state.curr_idx -= 1
-            st.rerun()
+        col_prev.button(
+            "⬅️ Previous",
+            on_click=step_version_callback,
+            args=(-1,),
+            use_container_width=True,
+            disabled=(st.session_state.curr_idx == 0)
+        )
         
         total_versions = len(st.session_state.history)
         col_info.markdown(
@@ -479,9 +997,13 @@ Original Text:
             unsafe_allow_html=True
         )
         
-        if col_next.button("Next ➡️", use_container_width=True, disabled=(st.session_state.curr_idx >= total_versions - 1)):
-            st.session_state.curr_idx += 1
-            st.rerun()
+        col_next.button(
+            "Next ➡️",
+            on_click=step_version_callback,
+            args=(1,),
+            use_container_width=True,
+            disabled=(st.session_state.curr_idx >= total_versions - 1)
+        )
 
         st.markdown("---")
 
@@ -490,75 +1012,56 @@ Original Text:
         
         # Button 1: Accept and Add to Batch (for multiple entries)
         if b1.button("✅ Accept & Add More", on_click=clear_form_callback, use_container_width=True):
-            # Add brief to batch
-            entry_brief = {
-                "rank": curr["rank"],
-                "name": curr["name"],
-                "text": st.session_state.history[st.session_state.curr_idx]["brief"],
-                "award": curr["award"],
-                "unit": curr["unit"],
-                "month": curr["month"],
-                "ippt": curr.get("ippt", ""),
-                "bmi": curr.get("bmi", ""),
-                "atp": curr.get("atp", ""),
-                "previous_awards": curr.get("previous_awards", "")
-            }
-            st.session_state.batch_list.append(entry_brief)
-            
-            # Update Google Sheet
-            update_sheet([entry_brief])
+            with st.session_state.profiler.action("accept"):
+                # Add brief to batch
+                entry_brief = build_entry(curr, curr["brief"])
+                add_to_batch(entry_brief)
+                end_session()
+                
+                # Update Google Sheet (and the nominee lookup)
+                track_accepted([entry_brief])
             
             st.success(f"✓ Accepted {curr['name']} and added to tracking sheet!")
+            # Batch count (sidebar) and cleared form (input fragment) need a full rerun
             st.rerun()
 
         # Button 2: Accept and Export (finalizes current + batch)
         if b2.button("💾 Accept & Export", use_container_width=True, type="primary"):
-            # Create current entry
-            current_entry = {
-                "rank": curr["rank"],
-                "name": curr["name"],
-                "text": st.session_state.history[st.session_state.curr_idx]["brief"],
-                "award": curr["award"],
-                "unit": curr["unit"],
-                "month": curr["month"],
-                "ippt": curr.get("ippt", ""),
-                "bmi": curr.get("bmi", ""),
-                "atp": curr.get("atp", ""),
-                "previous_awards": curr.get("previous_awards", "")
-            }
-            
-            # Prepare all data for export (batch + current)
-            export_data = st.session_state.batch_list.copy()
-            
-            # Check if current entry is already in batch
-            is_in_batch = any(
-                item["rank"] == current_entry["rank"] and 
-                item["name"] == current_entry["name"] and
-                "(CITATION)" not in item["name"]
-                for item in export_data
-            )
-            
-            # If not in batch, add current entry
-            if not is_in_batch:
-                export_data.append(current_entry)
+            with st.session_state.profiler.action("export"):
+                # Create current entry
+                current_entry = build_entry(curr, curr["brief"])
+                
+                # Prepare all data for export (batch + current, skipping duplicates)
+                export_data, added_current = merge_export_entries(st.session_state.batch_list, current_entry)
                 
                 # Update Google Sheet for current entry only
-                update_sheet([current_entry])
-            
-            # Generate Word document with all data
-            doc_bytes = generate_docx(export_data)
+                if added_current:
+                    track_accepted([current_entry])
+                
+                # Generate Word document with all data
+                doc_bytes = generate_docx(export_data)
             
+            # Clear batch after export; the download is offered after the rerun
+            st.session_state.export_doc = {
+                "data": doc_bytes,
+                "file_name": f"Award_Justifications_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
+            }
+            clear_batch()
+            end_session()
+            # Batch count and Clear Batch (sidebar) need a full rerun
+            st.rerun()
+        
+        export_doc = st.session_state.get("export_doc")
+        if export_doc:
             # Download button
             st.download_button(
                 label="📥 Download Word Document",
-                data=doc_bytes,
-                file_name=f"Award_Justifications_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx",
+                data=export_doc["data"],
+                file_name=export_doc["file_name"],
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                on_click=dismiss_export_callback,
                 use_container_width=True
             )
-            
-            # Clear batch after export
-            st.session_state.batch_list = []
             st.success("✓ Document generated! All entries sent to tracking sheet.")
             
     else:
@@ -575,4 +1078,19 @@ Original Text:
         7. Choose action:
            - **Accept & Add More**: Save to batch and enter another award
            - **Accept & Export**: Finalize and download Word document
-        """)
\ No newline at end of file
+        """)
+
+
+# Main Layout
+left_col, right_col = st.columns(2)
+
+with left_col:
+    render_input_form()
+
+with right_col:
+    render_output_panel()
+
+if st.session_state.pending_model:
+    watch_model_result()
+
+st.session_state.profiler.finish_run()
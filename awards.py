@@ -197,17 +197,20 @@ def get_citation_examples(award_type):
     """
     return CITATION_EXAMPLES.get(award_type, [])
 
-def format_examples_for_prompt(award_type):
+def format_examples_for_prompt(award_type, max_examples=None):
     """
     Formats examples into a string suitable for AI prompt.
 
     Args:
         award_type (str): The award type
+        max_examples (int): Only use the first N examples (default: all)
 
     Returns:
         str: Formatted examples with headers
     """
     examples = get_examples_for_award(award_type)
+    if max_examples is not None:
+        examples = examples[:max_examples]
 
     if not examples:
         return ""
@@ -0,0 +1,248 @@
+"""
+Microbenchmarks for the non-network parts of the pipeline.
+
+Covers:
+  - generate_docx at 1, 10, 100 and 1000 entries for each layout mix
+    (CTO/FSM 3-column, other 2-column, citations, and a realistic mix)
+  - format_examples_for_prompt and build_prompt for each award key
+  - build_tracking_rows and update_sheet against a fake worksheet, both
+    the direct path and the app's path queued through shared state
+  - merge_export_entries (the export handler's batch dedupe)
+  - nominee index lookups (exact, prefix, misspelt and bare common surnames)
+    over 50k rows
+
+Results are written as JSON. --compare checks a previous results file and
+exits non-zero if any benchmark's median got slower by more than
+--threshold (default 10%).
+
+Usage:
+    python benchmarks/bench_core.py --output bench.json
+    python benchmarks/bench_core.py --output new.json --compare bench.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import utils  # noqa: E402
+from awards import AWARD_EXAMPLES, format_examples_for_prompt  # noqa: E402
+from core import build_prompt, get_award_rule_text, merge_export_entries  # noqa: E402
+from nominee_index import NomineeIndex  # noqa: E402
+from shared_state import MemorySharedState  # noqa: E402
+
+DOCX_SIZES = (1, 10, 100, 1000)
+ROW_SIZES = (1, 10, 100, 1000)
+INDEX_ROWS = 50_000
+
+SAMPLE_TEXT = (
+    "Being a dedicated Transport Operator from Alpha COY, CPL TAN has consistently "
+    "displayed exceptional professionalism in his role. He mentors junior operators, "
+    "maintains his fleet to a high standard and supports overseas exercises. "
+) * 3
+
+
+# --- FIXTURES ---
+def make_entry(i, kind):
+    """Builds a synthetic export entry of the given layout kind"""
+    entry = {
+        "rank": "CPL",
+        "name": f"SERVICEMAN {i}",
+        "text": SAMPLE_TEXT,
+        "unit": "Alpha COY",
+        "month": "January 2026",
+        "award": "CO Coin",
+        "ippt": "",
+        "bmi": "",
+        "atp": "",
+        "previous_awards": "",
+    }
+    if kind == "cto_fsm":
+        entry.update(award="CTO Coin" if i % 2 else "FSM Coin", ippt="85", bmi="22.5",
+                     atp="33", previous_awards="CO Coin, RSM Coin, BSOM")
+    elif kind == "citation":
+        entry.update(award="CTO Coin", name=f"SERVICEMAN {i} (CITATION)")
+    return entry
+
+
+def make_entries(n, mix):
+    """Builds n entries; 'mixed' cycles through 2-column, 3-column and citation layouts"""
+    if mix == "mixed":
+        kinds = ("other", "cto_fsm", "citation")
+        return [make_entry(i, kinds[i % 3]) for i in range(n)]
+    return [make_entry(i, mix) for i in range(n)]
+
+
+def make_tracking_rows(n):
+    """Builds n tracking sheet rows over a deliberately repetitive pool of names"""
+    surnames = ("TAN", "LIM", "LEE", "NG", "ONG", "WONG", "GOH", "CHUA", "MUHAMMAD", "KUMAR")
+    given = ("AH KOW", "WEI MING", "JUN WEI", "KAI XUAN", "HAFIZ", "ARJUN", "RYAN", "ETHAN")
+    awards = ("CO Coin", "RSM Coin", "CTO Coin", "FSM Coin", "BSOM")
+    return [
+        ["CPL", f"{surnames[i % 10]} {given[i // 10 % 8]} {i % 7919:04d}", "Alpha COY",
+         awards[i % 5], "January 2026", "NOMINATED", ""]
+        for i in range(n)
+    ]
+
+
+class FakeWorksheet:
+    """Stands in for a gspread worksheet; records rows instead of calling the API"""
+
+    def __init__(self):
+        self.rows = []
+
+    def append_row(self, row, **kwargs):
+        self.rows.append(row)
+
+    def append_rows(self, rows, **kwargs):
+        self.rows.extend(rows)
+
+
+# --- HARNESS ---
+def measure(func, repeat, min_time=0.05):
+    """
+    Times func, looping each sample until min_time has elapsed.
+
+    Returns:
+        dict: median/min seconds per call and the number of samples
+    """
+    # Calibrate the inner loop so tiny functions are not dominated by timer noise
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "runs": len(samples)}
+
+
+def collect_benchmarks(max_entries):
+    """Returns {name: zero-argument callable} for every benchmark"""
+    benchmarks = {}
+
+    for mix in ("cto_fsm", "other", "citation", "mixed"):
+        for n in DOCX_SIZES:
+            if n <= max_entries:
+                items = make_entries(n, mix)
+                benchmarks[f"generate_docx[{mix},n={n}]"] = lambda items=items: utils.generate_docx(items)
+
+    for award in AWARD_EXAMPLES:
+        benchmarks[f"format_examples_for_prompt[{award}]"] = (
+            lambda award=award: format_examples_for_prompt(award))
+        benchmarks[f"build_prompt[{award}]"] = lambda award=award: build_prompt(
+            award=award, role="Transport Operator (TO)", unit="Alpha COY", rank="CPL",
+            full_name="TAN AH KOW", preferred_name="TAN",
+            award_rule_text=get_award_rule_text(award), draft=SAMPLE_TEXT)
+
+    for n in ROW_SIZES:
+        if n > max_entries:
+            continue
+        items = make_entries(n, "mixed")
+        benchmarks[f"build_tracking_rows[n={n}]"] = lambda items=items: utils.build_tracking_rows(items)
+        benchmarks[f"update_sheet[fake,n={n}]"] = lambda items=items: run_update_sheet(items)
+        # The app's path: queued in shared state, fresh per call since repeats would be deduped to
+        # no-ops (repeated nominations within the sample collapse to one row, as in the app)
+        benchmarks[f"update_sheet[fake,queued,n={n}]"] = (
+            lambda items=items: run_update_sheet(items, state=MemorySharedState()))
+        current = make_entry(n, "other")
+        benchmarks[f"merge_export_entries[n={n}]"] = (
+            lambda items=items, current=current: merge_export_entries(items, current))
+
+    index = NomineeIndex()
+    index.add_rows(make_tracking_rows(INDEX_ROWS))
+    for label, query in (("exact", "TAN AH KOW 0010"), ("prefix", "TAN AH K"), ("misspelt", "TAN AHKOW 001"),
+                         ("surname", "TAN"), ("surname-long", "MUHAMMAD")):
+        benchmarks[f"nominee_index.search[{label},rows={INDEX_ROWS}]"] = (
+            lambda query=query: index.search(query, limit=3))
+
+    return benchmarks
+
+
+def run_update_sheet(items, state=None):
+    """Runs update_sheet against a fake worksheet with logging silenced"""
+    with mock.patch.object(utils, "get_worksheet", return_value=FakeWorksheet()), \
+            mock.patch("builtins.print"):
+        utils.update_sheet(items, credentials={}, state=state)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares medians against a baseline results file.
+
+    Returns:
+        list: (name, baseline median, new median, ratio) for regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        ratio = result["median_s"] / old["median_s"] if old["median_s"] else 1.0
+        marker = ""
+        if ratio > 1 + threshold:
+            regressions.append((name, old["median_s"], result["median_s"], ratio))
+            marker = "  <-- REGRESSION"
+        print(f"{name:<52} {old['median_s'] * 1000:10.3f} ms -> "
+              f"{result['median_s'] * 1000:10.3f} ms  ({ratio:5.2f}x){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SAFAISA microbenchmarks")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed slowdown before flagging a regression (0.10 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per benchmark")
+    parser.add_argument("--max-entries", type=int, default=max(DOCX_SIZES),
+                        help="Skip sizes above this (for quick runs)")
+    parser.add_argument("--filter", default="", help="Only run benchmarks containing this text")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in collect_benchmarks(args.max_entries).items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(func, args.repeat)
+        print(f"{name:<52} {results[name]['median_s'] * 1000:10.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                },
+                "benchmarks": results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+        print(f"\nComparison against {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
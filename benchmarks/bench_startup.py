@@ -0,0 +1,107 @@
+"""
+Cold start measurement for the Streamlit app.
+
+Each sample runs in a fresh interpreter so nothing is already imported:
+  - app_imports:   importing the app's own modules (utils, clients, ...)
+  - first_render:  a full first run of app.py (login screen) via AppTest
+  - sdk_imports:   importing the heavy SDKs, i.e. what a cold start paid
+                   before they were deferred
+
+It also checks that none of the heavy SDKs were imported by the first
+render, which is the regression this is meant to catch.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--output startup.json] [--strict]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SDKs that must only be imported on first generate / sheet write / export
+HEAVY_MODULES = ["google.generativeai", "gspread", "oauth2client", "docx"]
+
+SNIPPETS = {
+    "app_imports": """
+import time
+t = time.perf_counter()
+import utils, clients, awards, history
+print(time.perf_counter() - t)
+""",
+    "first_render": """
+import sys, time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+elapsed = time.perf_counter() - t
+heavy = [m for m in %r if m in sys.modules]
+print(elapsed, ",".join(heavy))
+""" % (HEAVY_MODULES,),
+    "sdk_imports": """
+import time
+t = time.perf_counter()
+import google.generativeai, gspread, oauth2client.service_account, docx
+print(time.perf_counter() - t)
+""",
+}
+
+
+def run_sample(snippet):
+    """Runs a snippet in a fresh interpreter and returns its stdout fields"""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", snippet],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip().splitlines()[-1].split(" ", 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SAFAISA cold start time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--strict", action="store_true",
+                        help="Exit non-zero if the first render imported a heavy SDK")
+    args = parser.parse_args()
+
+    results = {}
+    heavy_loaded = set()
+
+    for name, snippet in SNIPPETS.items():
+        samples = []
+        for _ in range(args.runs):
+            fields = run_sample(snippet)
+            samples.append(float(fields[0]))
+            if name == "first_render" and len(fields) > 1 and fields[1]:
+                heavy_loaded.update(fields[1].split(","))
+
+        results[name] = {
+            "median_s": statistics.median(samples),
+            "min_s": min(samples),
+            "max_s": max(samples),
+            "runs": len(samples),
+        }
+        print(f"{name:<14} median {results[name]['median_s'] * 1000:8.1f} ms  "
+              f"(min {results[name]['min_s'] * 1000:.1f}, max {results[name]['max_s'] * 1000:.1f})")
+
+    results["heavy_modules_loaded_at_start"] = sorted(heavy_loaded)
+    if heavy_loaded:
+        print(f"WARNING: first render imported {', '.join(sorted(heavy_loaded))}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.strict and heavy_loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Offline quality-versus-latency evaluation of model and prompt variants.
+
+Replays a fixed corpus of drafts (benchmarks/eval_corpus.jsonl, same
+columns as the CLI's nominations file) through each variant in
+benchmarks/eval_variants.json and scores every output with the local rule
+checks in core.check_prompt_rules:
+  - word count within the award's limit (AWARD_WORD_LIMITS)
+  - opening line "Being a/an ..."
+  - no asterisks, no recommendation ending
+  - no exercise names (including names taken from the draft)
+
+A variant is a JSON object with a "name" and any of:
+  model            model name (default core.MODEL_PRO)
+  max_examples     only put the first N award examples in the prompt
+  thinking_budget  override the award's generation profile; only sent if the
+                   installed SDK has thinking_config (the google-generativeai
+                   releases up to 0.8 do not), so recording such a variant
+                   is refused otherwise - it would be the same request as
+                   the variant without it
+  temperature      override the award's generation profile
+  prompt           "module:function" with core.build_prompt's signature,
+                   e.g. a copy of the old prompt to compare against
+
+Model responses are recorded to a JSONL file keyed by model, generation
+profile and prompt text. The default mode replays recordings only, so a
+run is reproducible without network or an API key; --mode record calls
+the model for anything not yet recorded and --mode refresh re-records
+everything.
+
+Usage:
+    python benchmarks/eval_harness.py --mode record      # needs GEMINI_API_KEY
+    python benchmarks/eval_harness.py                    # offline replay
+    python benchmarks/eval_harness.py --variants flash flash-2-examples --output eval.json
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import core  # noqa: E402
+from awards import format_examples_for_prompt  # noqa: E402
+from clients import get_model, supports_thinking_config  # noqa: E402
+from safaisa import read_records  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, "eval_corpus.jsonl")
+DEFAULT_VARIANTS = os.path.join(BENCH_DIR, "eval_variants.json")
+DEFAULT_RECORDINGS = os.path.join(BENCH_DIR, "eval_recordings.jsonl")
+
+# USD per million tokens (input, output); thinking tokens are billed as output
+MODEL_PRICES_PER_MTOK = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+
+# --- PROMPTS ---
+def load_prompt_builder(spec):
+    """Returns the prompt function for a variant ("module:function", default core.build_prompt)"""
+    if not spec:
+        return core.build_prompt
+    module_name, func_name = spec.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def build_case(variant, nomination):
+    """
+    Builds the prompt and generation settings for one corpus item.
+
+    Returns:
+        dict: prompt, model, profile, word_limit and the recording key
+    """
+    award = nomination.get("award", "")
+    word_limit = core.get_word_limit(award, nomination.get("word_limit", ""))
+    name = nomination.get("name", "").upper()
+
+    build_prompt = load_prompt_builder(variant.get("prompt"))
+    examples = partial(format_examples_for_prompt, max_examples=variant.get("max_examples"))
+    with mock.patch.object(core, "format_examples_for_prompt", examples):
+        prompt = build_prompt(
+            award=award,
+            role=nomination.get("role", ""),
+            unit=nomination.get("unit", ""),
+            rank=nomination.get("rank", ""),
+            full_name=name,
+            preferred_name=(nomination.get("preferred_name") or name.split(" ")[-1]).upper(),
+            award_rule_text=core.get_award_rule_text(award, nomination.get("word_limit", "")),
+            draft=nomination.get("draft", "")
+        )
+
+    profile = core.get_generation_profile(award, word_limit)
+    for field in ("thinking_budget", "temperature"):
+        if field in variant:
+            profile[field] = variant[field]
+
+    model = variant.get("model", core.MODEL_PRO)
+    key = hashlib.sha256(json.dumps(
+        {"model": model, "profile": profile, "prompt": prompt}, sort_keys=True
+    ).encode("utf-8")).hexdigest()
+
+    return {"prompt": prompt, "model": model, "profile": profile, "word_limit": word_limit, "key": key}
+
+
+# --- RECORDINGS ---
+def load_recordings(path):
+    """Returns {key: recording}; later lines win"""
+    if not os.path.exists(path):
+        return {}
+    recordings = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                recording = json.loads(line)
+                recordings[recording["key"]] = recording
+    return recordings
+
+
+class _ResponseRecorder:
+    """Wraps a model so the raw responses (and their token usage) can be read after a call"""
+
+    def __init__(self, model):
+        self._model = model
+        self.responses = []
+
+    def generate_content(self, *args, **kwargs):
+        response = self._model.generate_content(*args, **kwargs)
+        self.responses.append(response)
+        return response
+
+
+def record_case(case, api_key):
+    """Calls the model for a case (as the app does, including the token-cap retry)"""
+    model = _ResponseRecorder(get_model(case["model"], api_key))
+
+    started = time.perf_counter()
+    text = core._request(model, case["prompt"], core.build_generation_config(case["profile"]))
+    latency = time.perf_counter() - started
+
+    usage = {"prompt_tokens": 0, "output_tokens": 0, "thinking_tokens": 0}
+    for response in model.responses:
+        metadata = getattr(response, "usage_metadata", None)
+        usage["prompt_tokens"] += getattr(metadata, "prompt_token_count", 0) or 0
+        usage["output_tokens"] += getattr(metadata, "candidates_token_count", 0) or 0
+        usage["thinking_tokens"] += getattr(metadata, "thoughts_token_count", 0) or 0
+
+    return dict(
+        usage,
+        key=case["key"],
+        model=case["model"],
+        text=text,
+        latency_s=round(latency, 3),
+        calls=len(model.responses),
+        recorded_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+    )
+
+
+# --- SCORING ---
+def cost_usd(recording):
+    price_in, price_out = MODEL_PRICES_PER_MTOK.get(recording["model"], (0.0, 0.0))
+    output = recording["output_tokens"] + recording["thinking_tokens"]
+    return (recording["prompt_tokens"] * price_in + output * price_out) / 1_000_000
+
+
+def score_variant(name, results):
+    """Aggregates per-item results into one summary row"""
+    scored = [r for r in results if r.get("checks")]
+    summary = {"variant": name, "items": len(results), "scored": len(scored),
+               "missing": sum(1 for r in results if r.get("missing")),
+               "errors": sum(1 for r in results if r.get("error"))}
+    if not scored:
+        return summary
+
+    rules = sorted({rule for r in scored for rule in r["checks"]})
+    latencies = sorted(r["latency_s"] for r in scored)
+    summary.update({
+        "compliance": sum(all(r["checks"].values()) for r in scored) / len(scored),
+        "rules": {rule: sum(r["checks"].get(rule, True) for r in scored) / len(scored) for rule in rules},
+        "p50_latency_s": statistics.median(latencies),
+        "p90_latency_s": latencies[min(len(latencies) - 1, int(round(0.9 * (len(latencies) - 1))))],
+        "mean_prompt_tokens": statistics.mean(r["prompt_tokens"] for r in scored),
+        "mean_output_tokens": statistics.mean(r["output_tokens"] + r["thinking_tokens"] for r in scored),
+        "cost_per_100_usd": 100 * statistics.mean(r["cost_usd"] for r in scored),
+        "mean_words": statistics.mean(len(r["text"].split()) for r in scored),
+    })
+    return summary
+
+
+# --- RUN ---
+def run(variants, corpus, recordings_path, mode, api_key, workers):
+    """Evaluates every variant on every corpus item; returns (summaries, details)"""
+    recordings = load_recordings(recordings_path)
+    write_lock = threading.Lock()
+
+    cases = []
+    for variant in variants:
+        for nomination in corpus:
+            cases.append((variant, nomination, build_case(variant, nomination)))
+
+    def evaluate(item):
+        variant, nomination, case = item
+        result = {"variant": variant["name"], "id": core.nomination_id(nomination), "model": case["model"]}
+        recording = recordings.get(case["key"])
+
+        if mode == "refresh" or (mode == "record" and not recording):
+            try:
+                recording = record_case(case, api_key)
+            except Exception as e:
+                return dict(result, error=str(e))
+            with write_lock, open(recordings_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(recording) + "\n")
+
+        if not recording:
+            return dict(result, missing=True)
+        if core.is_error_text(recording["text"]):
+            return dict(result, error=recording["text"])
+
+        return dict(
+            result,
+            text=recording["text"],
+            latency_s=recording["latency_s"],
+            prompt_tokens=recording["prompt_tokens"],
+            output_tokens=recording["output_tokens"],
+            thinking_tokens=recording["thinking_tokens"],
+            cost_usd=cost_usd(recording),
+            checks=core.check_prompt_rules(recording["text"], case["word_limit"], nomination.get("draft", "")),
+        )
+
+    with ThreadPoolExecutor(max_workers=workers if mode != "replay" else 1) as pool:
+        details = list(pool.map(evaluate, cases))
+
+    summaries = [
+        score_variant(variant["name"], [d for d in details if d["variant"] == variant["name"]])
+        for variant in variants
+    ]
+    return summaries, details
+
+
+def print_report(summaries):
+    rules = sorted({rule for s in summaries for rule in s.get("rules", {})})
+    print(f"{'variant':<24} {'n':>3} {'comply':>7} {'p50 s':>7} {'p90 s':>7} "
+          f"{'in tok':>7} {'out tok':>8} {'$/100':>7}  " + " ".join(f"{r[:14]:>14}" for r in rules))
+    for s in summaries:
+        if not s["scored"]:
+            print(f"{s['variant']:<24} {0:>3}  (no recordings - run with --mode record)")
+            continue
+        print(f"{s['variant']:<24} {s['scored']:>3} {s['compliance']:>7.0%} {s['p50_latency_s']:>7.2f} "
+              f"{s['p90_latency_s']:>7.2f} {s['mean_prompt_tokens']:>7.0f} {s['mean_output_tokens']:>8.0f} "
+              f"{s['cost_per_100_usd']:>7.3f}  "
+              + " ".join(f"{s['rules'].get(r, 0):>14.0%}" for r in rules)
+              + (f"  missing {s['missing']}" if s["missing"] else "")
+              + (f"  errors {s['errors']}" if s["errors"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SAFAISA model / prompt evaluation")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Nominations .jsonl or .csv")
+    parser.add_argument("--variants-file", default=DEFAULT_VARIANTS, help="Variant definitions (JSON list)")
+    parser.add_argument("--variants", nargs="+", help="Only run these variant names")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Recorded responses (.jsonl)")
+    parser.add_argument("--mode", choices=("replay", "record", "refresh"), default="replay",
+                        help="replay: offline only; record: call the model for unrecorded cases; "
+                             "refresh: re-record everything")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent model calls when recording")
+    parser.add_argument("--api-key", help="Gemini API key (default: $GEMINI_API_KEY)")
+    parser.add_argument("--output", help="Write summaries and per-item results as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.variants_file, encoding="utf-8") as f:
+        variants = json.load(f)
+    if args.variants:
+        variants = [v for v in variants if v["name"] in args.variants]
+
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY")
+    if args.mode != "replay" and not api_key:
+        sys.exit("Error: recording needs GEMINI_API_KEY or --api-key")
+    budgeted = [v["name"] for v in variants if "thinking_budget" in v]
+    if args.mode != "replay" and budgeted and not supports_thinking_config():
+        sys.exit(f"Error: the installed Gemini SDK cannot send a thinking budget, so {', '.join(budgeted)} "
+                 "would record the same requests as without it - upgrade the SDK or leave them out")
+
+    summaries, details = run(variants, read_records(args.corpus), args.recordings,
+                             args.mode, api_key, args.workers)
+    print_report(summaries)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summaries": summaries, "results": details}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Multi-session load test for the Streamlit app.
+
+Runs N simulated clerks concurrently against app.py using Streamlit's
+headless AppTest API. Each session logs in, fills the form, generates,
+regenerates, navigates versions, accepts and exports. Gemini and the
+tracking sheet are replaced with fakes that sleep for a configurable time,
+so the numbers reflect app overhead plus simulated upstream latency.
+
+For each N it reports:
+  - per-interaction latency percentiles (p50 / p90 / p99)
+  - script-thread saturation: process CPU time / wall time (a value near
+    1.0 means the GIL-bound script threads, not upstream waits, are the
+    bottleneck) and the peak number of live threads
+  - memory growth: Python heap (tracemalloc) and RSS increase over the run
+
+Usage:
+    python benchmarks/load_test.py --sessions 1 2 4 8 --model-latency 0.5 --output load.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.runtime.secrets import Secrets  # noqa: E402
+import streamlit  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import core  # noqa: E402
+import utils  # noqa: E402
+
+APP_PATH = os.path.join(REPO_ROOT, "app.py")
+PASSWORD = "NSAF123"
+SECRETS = {"GEMINI_API_KEY": "load-test"}
+
+DRAFT = (
+    "He is a reliable Transport Operator who mentors new drivers, keeps his vehicle "
+    "serviceable and volunteered for an overseas exercise."
+)
+
+
+# --- FAKE UPSTREAMS ---
+FAKE_TEXT = (
+    "Being a dedicated Transport Operator (TO) from Alpha COY, CPL TAN consistently "
+    "displays professionalism and mentors new drivers with patience."
+)
+
+
+def fake_call_gemini(latency):
+    def _call(prompt, api_key, *args, **kwargs):
+        time.sleep(latency)
+        return FAKE_TEXT
+    return _call
+
+
+def fake_start_session(latency):
+    def _start(prompt, api_key, award="", word_limit=None, draft_words=0):
+        time.sleep(latency)
+        return FAKE_TEXT, {"model": "fake", "award": award, "word_limit": word_limit, "turns": []}
+    return _start
+
+
+def fake_continue_session(latency):
+    def _continue(session, instructions, current_text, api_key):
+        time.sleep(latency)
+        return FAKE_TEXT
+    return _continue
+
+
+def fake_update_sheet(latency):
+    def _update(items, *args, **kwargs):
+        time.sleep(latency)
+    return _update
+
+
+# --- SHARED RUNTIME ---
+def shared_runtime_patches():
+    """
+    Lets several AppTest sessions run at once in one process.
+
+    AppTest installs a mock Runtime for the duration of each run and resets
+    it to None afterwards, which breaks any other session still running.
+    A real server has one Runtime shared by all sessions, so the same is
+    simulated here: whenever no per-run runtime is installed, a shared mock
+    one is returned instead.
+
+    AppTest also builds a fresh ScriptCache (and recompiles app.py) on every
+    run, where a server compiles once. Bytecode is shared here as well, which
+    keeps the measurements realistic and avoids concurrent ast.parse calls.
+
+    Secrets are installed once as well: AppTest swaps the global st.secrets
+    in and out around every run given per-test secrets, so concurrent
+    sessions would overwrite each other's.
+    """
+    shared = mock.MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+
+    def instance(cls):
+        return cls._instance if cls._instance is not None else shared
+
+    bytecode_lock = threading.Lock()
+    bytecode = {}
+    original_get_bytecode = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        with bytecode_lock:
+            if script_path not in bytecode:
+                bytecode[script_path] = original_get_bytecode(self, script_path)
+            return bytecode[script_path]
+
+    secrets = Secrets()
+    secrets._secrets = dict(SECRETS)
+
+    return (
+        mock.patch.object(streamlit, "secrets", secrets),
+        mock.patch.object(Runtime, "instance", classmethod(instance)),
+        mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)),
+        mock.patch.object(ScriptCache, "get_bytecode", get_bytecode),
+    )
+
+
+# --- SESSION SCRIPT ---
+def _widget(elements, label):
+    return next(w for w in elements if w.label == label)
+
+
+def run_session(session_no, timeout):
+    """Runs one clerk's full flow; returns the latency of each interaction (raises on failure)"""
+    timings = defaultdict(list)
+
+    def step(name, action=None):
+        if action:
+            action()
+        started = time.perf_counter()
+        at.run(timeout=timeout)
+        timings[name].append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(f"session {session_no} {name}: {at.exception[0].message}")
+
+    # Secrets come from the shared patch (see shared_runtime_patches), never at.secrets
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    step("first_render")
+    step("login", lambda: (
+        _widget(at.text_input, "Enter Password").input(PASSWORD),
+        _widget(at.button, "Login").click()
+    ))
+    step("fill_form", lambda: (
+        _widget(at.text_input, "Rank").input("CPL"),
+        _widget(at.text_input, "Full Name").input(f"TAN AH KOW {session_no}"),
+        _widget(at.text_input, "Preferred / First Name").input("TAN"),
+        _widget(at.text_area, "Draft Write-up").input(DRAFT)
+    ))
+    step("generate", lambda: _widget(at.button, "✨ Generate Justification").click())
+    step("regenerate", lambda: (
+        _widget(at.text_input, "Modification Instructions").input("Make it more humble"),
+        _widget(at.button, "🔄 Regenerate Brief").click()
+    ))
+    step("previous", lambda: _widget(at.button, "⬅️ Previous").click())
+    step("next", lambda: _widget(at.button, "Next ➡️").click())
+    step("accept", lambda: _widget(at.button, "✅ Accept & Add More").click())
+    step("export", lambda: _widget(at.button, "💾 Accept & Export").click())
+    return timings
+
+
+# --- MEASUREMENT ---
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def rss_mb():
+    """Peak resident set size of this process in MB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 if sys.platform != "darwin" else usage / (1024 * 1024)
+
+
+def run_level(n_sessions, timeout):
+    """Runs n_sessions concurrently and returns the measurements"""
+    timings = defaultdict(list)
+    errors = []
+    peak_threads = threading.active_count()
+    stop = threading.Event()
+
+    def watch_threads():
+        nonlocal peak_threads
+        while not stop.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.01)
+
+    watcher = threading.Thread(target=watch_threads, daemon=True)
+    watcher.start()
+
+    heap_before = tracemalloc.get_traced_memory()[0]
+    rss_before = rss_mb()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=n_sessions) as pool:
+        futures = [pool.submit(run_session, i, timeout) for i in range(n_sessions)]
+        for future in futures:
+            try:
+                session_timings = future.result()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            # Failed sessions are reported as errors only, so they do not skew the percentiles
+            for name, samples in session_timings.items():
+                timings[name].extend(samples)
+
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    stop.set()
+    watcher.join()
+
+    all_samples = [s for samples in timings.values() for s in samples]
+    return {
+        "sessions": n_sessions,
+        "errors": errors,
+        "wall_s": wall,
+        "cpu_over_wall": cpu / wall if wall else 0.0,
+        "peak_threads": peak_threads,
+        "heap_growth_mb": (tracemalloc.get_traced_memory()[0] - heap_before) / (1024 * 1024),
+        "rss_growth_mb": rss_mb() - rss_before,
+        "latency": {
+            name: {
+                "p50_s": percentile(samples, 50),
+                "p90_s": percentile(samples, 90),
+                "p99_s": percentile(samples, 99),
+                "mean_s": statistics.mean(samples),
+            }
+            for name, samples in sorted(timings.items()) + [("all", all_samples)]
+            if samples
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SAFAISA multi-session load test")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrent session counts to test")
+    parser.add_argument("--model-latency", type=float, default=0.5,
+                        help="Simulated Gemini latency per call (seconds)")
+    parser.add_argument("--sheet-latency", type=float, default=0.2,
+                        help="Simulated tracking sheet write latency (seconds)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-interaction timeout (seconds)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    results = []
+
+    secrets, runtime_instance, runtime_exists, script_cache = shared_runtime_patches()
+
+    with mock.patch.object(core, "call_gemini", fake_call_gemini(args.model_latency)), \
+            mock.patch.object(core, "start_session", fake_start_session(args.model_latency)), \
+            mock.patch.object(core, "continue_session", fake_continue_session(args.model_latency)), \
+            mock.patch.object(utils, "update_sheet", fake_update_sheet(args.sheet_latency)), \
+            secrets, runtime_instance, runtime_exists, script_cache:
+        for n in args.sessions:
+            level = run_level(n, args.timeout)
+            results.append(level)
+
+            overall = level["latency"].get("all", {})
+            print(f"N={n:<3} p50 {overall.get('p50_s', 0) * 1000:8.1f} ms  "
+                  f"p90 {overall.get('p90_s', 0) * 1000:8.1f} ms  "
+                  f"p99 {overall.get('p99_s', 0) * 1000:8.1f} ms  "
+                  f"cpu/wall {level['cpu_over_wall']:.2f}  threads {level['peak_threads']:<4} "
+                  f"heap +{level['heap_growth_mb']:.1f} MB  rss +{level['rss_growth_mb']:.1f} MB"
+                  + (f"  errors {len(level['errors'])}" if level["errors"] else ""))
+            for error in level["errors"][:3]:
+                print(f"      {error}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "model_latency_s": args.model_latency,
+                "sheet_latency_s": args.sheet_latency,
+                "levels": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import threading
+
+
+# ============================================================================
+# LAZY API CLIENTS - Heavy SDKs are imported on first use, not at app start
+# ============================================================================
+# The Gemini and Google Sheets SDKs together take most of a cold start to
+# import. They are only needed once a clerk generates, accepts or exports,
+# so they are loaded here on demand and the built clients are shared by
+# every session in the process.
+
+_model_lock = threading.Lock()
+_sheet_lock = threading.Lock()
+_models = {}
+_worksheets = {}
+_thinking_supported = None
+
+SHEET_SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+
+def get_genai():
+    """Imports and returns the google.generativeai module"""
+    import google.generativeai as genai
+    return genai
+
+
+def supports_thinking_config():
+    """
+    Returns True if the installed Gemini SDK accepts a thinking budget.
+
+    Older google-generativeai releases have no thinking_config field in
+    GenerationConfig; the budget is then only enforced via max_output_tokens.
+    """
+    global _thinking_supported
+    if _thinking_supported is None:
+        get_genai()
+        from google.generativeai import protos
+        try:
+            protos.GenerationConfig(thinking_config={"thinking_budget": 0})
+            _thinking_supported = True
+        except (ValueError, TypeError):
+            _thinking_supported = False
+    return _thinking_supported
+
+
+def get_model(model_name, api_key):
+    """
+    Returns a cached Gemini model client.
+
+    Args:
+        model_name (str): Gemini model name (e.g. MODEL_PRO)
+        api_key (str): Gemini API key
+
+    Returns:
+        GenerativeModel: Client shared across sessions
+    """
+    key = (model_name, api_key)
+    with _model_lock:
+        if key not in _models:
+            genai = get_genai()
+            genai.configure(api_key=api_key)
+            _models[key] = genai.GenerativeModel(model_name)
+        return _models[key]
+
+
+def get_worksheet(credentials, spreadsheet_name, worksheet_name):
+    """
+    Returns a cached, authorized Google Sheets worksheet.
+
+    Falls back to the first sheet if worksheet_name does not exist.
+    gspread exceptions (e.g. SpreadsheetNotFound) are left to the caller.
+
+    Args:
+        credentials (dict): Service account credentials
+        spreadsheet_name (str): Name of the tracking spreadsheet
+        worksheet_name (str): Name of the worksheet inside it
+
+    Returns:
+        Worksheet: gspread worksheet shared across sessions
+    """
+    credentials = dict(credentials)
+    key = (credentials.get("client_email", ""), spreadsheet_name, worksheet_name)
+    with _sheet_lock:
+        if key not in _worksheets:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials, SHEET_SCOPE)
+            client = gspread.authorize(creds)
+            spreadsheet = client.open(spreadsheet_name)
+
+            try:
+                sheet = spreadsheet.worksheet(worksheet_name)
+            except gspread.exceptions.WorksheetNotFound:
+                sheet = spreadsheet.sheet1
+
+            _worksheets[key] = sheet
+        return _worksheets[key]
+
+
+def warm_up(api_key=None, model_names=(), credentials=None,
+            spreadsheet_name=None, worksheet_name=None):
+    """
+    Builds model clients and the sheet connection in a background thread.
+
+    Called right after login so the first generate or accept does not pay
+    for SDK imports and authentication. Failures are only logged; the
+    normal call path will retry and surface errors to the clerk.
+
+    Secrets must be read by the caller (script thread) and passed in.
+
+    Returns:
+        threading.Thread: The started daemon thread
+    """
+    def _run():
+        if api_key:
+            for model_name in model_names:
+                try:
+                    get_model(model_name, api_key)
+                except Exception as e:
+                    print(f"INFO: Model warm-up skipped - {str(e)}")
+
+        if credentials and spreadsheet_name:
+            try:
+                get_worksheet(credentials, spreadsheet_name, worksheet_name)
+            except Exception as e:
+                print(f"INFO: Sheet warm-up skipped - {str(e)}")
+
+    thread = threading.Thread(target=_run, name="safaisa-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,708 @@
+import hashlib
+import re
+import threading
+import time
+from awards import format_examples_for_prompt
+from clients import get_model, supports_thinking_config
+from routing import ModelRouter
+from shared_state import MemorySharedState
+from singleflight import SingleFlight
+
+
+# ============================================================================
+# CONFIGURATION SECTION - Edit API model versions here if needed
+# ============================================================================
+MODEL_PRO = 'gemini-2.5-pro'      # Primary model for complex logic
+MODEL_FLASH = 'gemini-2.5-flash'  # Fallback model for speed
+
+# ============================================================================
+# MODEL ROUTING - Flash by default while it keeps to the rules, Pro when needed
+# ============================================================================
+MODEL_ROUTING_ENABLED = True        # False = always try MODEL_PRO first
+MODEL_ROUTING_OVERRIDES = {
+    "BSOM": MODEL_PRO,              # Edit per-award model overrides here
+}
+ROUTING_STRONG_WORD_LIMIT = 150     # Word limits at or above this go to MODEL_PRO
+ROUTING_LONG_DRAFT_WORDS = 250      # Drafts at or above this length go to MODEL_PRO
+ROUTING_MIN_COMPLIANCE = 0.9        # Flash rule compliance needed to keep routing to it
+ROUTING_MAX_LATENCY_RATIO = 1.5     # Route away from Flash when its p50 latency exceeds Pro's by this factor
+ROUTING_MAX_LATENCY_SECONDS = 20    # ... or exceeds this many seconds (if Pro is not slower)
+
+# Regenerations continue the nominee's chat; earlier redo turns beyond this
+# many are dropped (the original prompt and first answer are always kept)
+SESSION_CONTEXT_REDOS = 4
+
+# Identical generation calls in flight are coalesced into one upstream call.
+# A finished result can also be shared for this long, but that hands a clerk
+# who clicks Generate again for a different draft the same text, so it is off
+COALESCE_LINGER_SECONDS = 0
+
+# ============================================================================
+# SHARED QUOTA - Request budgets enforced across every app process
+# ============================================================================
+# Buckets live in the shared state backend (see set_shared_state), so
+# replicas behind one URL draw from the same per-model budget
+MODEL_RATE_LIMITS_RPM = {          # Requests per minute per model (None = unlimited)
+    MODEL_PRO: 150,
+    MODEL_FLASH: 1000,
+}
+RATE_LIMIT_MAX_WAIT_SECONDS = 20   # Longer waits fall back to the other model
+RESPONSE_CACHE_SECONDS = COALESCE_LINGER_SECONDS  # Finished results shared with other processes (0 = off)
+
+# ============================================================================
+# AWARD RULES CONFIGURATION
+# ============================================================================
+AWARD_WORD_LIMITS = {
+    "CO Coin": 110,
+    "RSM Coin": 110,
+    "CTO Coin": 100,    # Edit word limit here
+    "FSM Coin": 100,    # Edit word limit here
+    "BSOM": 180,
+}
+DEFAULT_WORD_LIMIT = 160  # Used for awards without a configured limit
+
+# ============================================================================
+# GENERATION PROFILES - Reasoning and output budgets per award
+# ============================================================================
+# Output tokens are derived from the award's word limit; the thinking budget
+# caps how long the model reasons before writing.
+AWARD_GENERATION_PROFILES = {
+    "CO Coin":  {"thinking_budget": 512,  "temperature": 0.6},
+    "RSM Coin": {"thinking_budget": 512,  "temperature": 0.6},
+    "CTO Coin": {"thinking_budget": 384,  "temperature": 0.6},    # Edit budgets here
+    "FSM Coin": {"thinking_budget": 384,  "temperature": 0.6},
+    "BSOM":     {"thinking_budget": 1024, "temperature": 0.7},
+}
+TOKENS_PER_WORD = 1.4              # Rough English tokens per word
+OUTPUT_TOKEN_HEADROOM = 1.5        # Allowance over the word limit before cutting off
+UNBUDGETED_THINKING_TOKENS = 4096  # Thinking allowance when the SDK cannot send a budget
+MAX_TOKENS_RETRY_FACTOR = 2        # A reply cut off by the cap is retried once with this much more
+GENERATION_STOP_SEQUENCES = [      # Stop if the model starts echoing the prompt
+    "DRAFT CONTENT:",
+    "EXAMPLE WRITE-UPS",
+]
+# ============================================================================
+
+# Fields carried from a nomination into its batch / export entry
+ENTRY_FIELDS = (
+    "rank", "name", "award", "unit", "month",
+    "ippt", "bmi", "atp", "previous_awards"
+)
+
+
+def get_word_limit(award, custom_rules=""):
+    """
+    Returns the numeric word limit for an award.
+
+    Args:
+        award (str): Award type
+        custom_rules (str): Word limit typed by the clerk, e.g. "300 words"
+
+    Returns:
+        int: Word limit, or None if a custom rule has no number in it
+    """
+    if custom_rules:
+        match = re.search(r"\d+", custom_rules)
+        return int(match.group()) if match else None
+    return AWARD_WORD_LIMITS.get(award, DEFAULT_WORD_LIMIT)
+
+
+def get_generation_profile(award, word_limit=None):
+    """
+    Returns the generation profile for an award.
+
+    Awards without a configured profile (custom "OTHER" awards) get one
+    derived from their word limit.
+
+    Args:
+        award (str): Award name
+        word_limit (int): Target word count (defaults to the award's limit)
+
+    Returns:
+        dict: thinking_budget, max_output_tokens, temperature, stop_sequences
+    """
+    word_limit = word_limit or get_word_limit(award) or DEFAULT_WORD_LIMIT
+    profile = AWARD_GENERATION_PROFILES.get(award)
+    if profile is None:
+        profile = {
+            "thinking_budget": min(2048, max(256, word_limit * 4)),
+            "temperature": 0.7,
+        }
+
+    return {
+        "thinking_budget": profile["thinking_budget"],
+        "max_output_tokens": int(word_limit * TOKENS_PER_WORD * OUTPUT_TOKEN_HEADROOM),
+        "temperature": profile["temperature"],
+        "stop_sequences": list(GENERATION_STOP_SEQUENCES),
+    }
+
+
+def build_generation_config(profile):
+    """
+    Converts a generation profile into the SDK's generation_config.
+
+    Gemini 2.5 counts thinking tokens towards max_output_tokens, so the cap
+    is the thinking budget plus the answer allowance. When the SDK supports
+    it, the thinking budget is also passed explicitly; otherwise the model
+    thinks as long as it likes, and the cap allows UNBUDGETED_THINKING_TOKENS
+    for that instead of the profile's budget.
+
+    Args:
+        profile (dict): From get_generation_profile
+
+    Returns:
+        dict: generation_config for generate_content
+    """
+    thinking_supported = supports_thinking_config()
+    thinking_tokens = profile["thinking_budget"] if thinking_supported else UNBUDGETED_THINKING_TOKENS
+    config = {
+        "max_output_tokens": thinking_tokens + profile["max_output_tokens"],
+        "temperature": profile["temperature"],
+        "stop_sequences": profile["stop_sequences"],
+    }
+    if thinking_supported:
+        config["thinking_config"] = {"thinking_budget": profile["thinking_budget"]}
+    return config
+
+
+def get_award_rule_text(award, custom_rules=""):
+    """
+    Returns the length rule given to the model for an award.
+
+    Args:
+        award (str): Award type
+        custom_rules (str): Word limit typed by the clerk for "OTHER" awards
+
+    Returns:
+        str: e.g. "110 words"
+    """
+    if custom_rules:
+        return custom_rules
+    return f"{AWARD_WORD_LIMITS.get(award, DEFAULT_WORD_LIMIT)} words"
+
+
+# ============================================================================
+# AI PROMPT CONFIGURATION - EDIT GENERATION RULES HERE
+# ============================================================================
+def build_prompt(award, role, unit, rank, full_name, preferred_name, award_rule_text, draft):
+    """
+    Builds the generation prompt for a nomination.
+
+    Args:
+        award (str): Award name (selects the examples)
+        role (str): Serviceman vocation
+        unit (str): Company / Node
+        rank (str): Rank
+        full_name (str): Full name in caps
+        preferred_name (str): Preferred / first name in caps
+        award_rule_text (str): Length rule, e.g. "110 words"
+        draft (str): Clerk's draft write-up
+
+    Returns:
+        str: Prompt text
+    """
+    # Get examples for this award type
+    examples_text = format_examples_for_prompt(award)
+
+    return f"""
+Role: {role}
+Unit: {unit}
+Award: {award}
+Subject: {rank} {full_name}
+
+INSTRUCTIONS:
+1. Tense: Use strictly Past or Present tense only
+2. Exercise Names: Remove ALL exercise names (e.g., Ex Wallaby, Ex Thunder) instead mention them as exercise or overseas exercise
+3. Opening Line: Start with 'Being a [appropriate adjective] {role} from {unit}...'
+4. Name Usage: Use '{rank} {preferred_name}'
+5. Length: Approximately {award_rule_text}
+6. Tone: Professional, formal military writing
+7. Focus: Highlight any two or three of the serviceman's specific achievements, leadership, primary and secondary duties, inspiration to peers, attitude, safety, punctuality and contributions depending on the context given by user
+8. Style: Match the format, structure, and tone of the examples below
+9. Formatting Rules:
+   - Do NOT use asterisks (*) for emphasis or highlighting
+   - Do NOT use bold, italics, or any special formatting
+   - Write in plain text only
+   - Do NOT end with recommendation phrases like "I recommend him", "he deserves", "worthy of this award", etc.
+   - End with the last achievement or quality statement
+10. Output: Provide ONLY the final justification text in plain text format with no explanations, no meta-commentary, no formatting marks
+
+{examples_text}
+DRAFT CONTENT:
+{draft}
+
+Generate the final award justification following all rules above. Remember: plain text only, no asterisks, no recommendation ending.
+"""
+
+
+# ============================================================================
+# REDO PROMPT - EDIT MODIFICATION RULES HERE
+# ============================================================================
+def build_redo_prompt(instructions, text):
+    """
+    Builds the prompt that rewrites an existing justification.
+
+    Args:
+        instructions (str): Clerk's modification instructions
+        text (str): Current justification text
+
+    Returns:
+        str: Prompt text
+    """
+    return f"""
+Rewrite the following text with these modifications: {instructions}
+
+Maintain the same structure and professionalism.
+Output ONLY the revised text, no explanations.
+
+Original Text:
+{text}
+"""
+
+
+def build_session_redo_turn(instructions, edited_text=None):
+    """
+    Builds the follow-up turn sent in a regeneration session.
+
+    The original rules, examples and draft are already in the session, so
+    only the modification (and any manual edit by the clerk) is sent.
+
+    Args:
+        instructions (str): Clerk's modification instructions
+        edited_text (str): The clerk's edited version, if it differs from
+                           the model's last answer
+
+    Returns:
+        str: Turn text
+    """
+    turn = f"Revise the justification with these modifications: {instructions}\n"
+    if edited_text:
+        turn += f"\nThe clerk has edited your last version. Revise this text instead:\n{edited_text}\n"
+    turn += ("\nKeep following every rule and the length from the first message. "
+             "Output ONLY the revised text, no explanations.")
+    return turn
+# ============================================================================
+
+
+# --- AI ENGINE ---
+_inflight = SingleFlight(linger=COALESCE_LINGER_SECONDS)
+_shared = MemorySharedState()
+_cap_hits = [0]  # Replies cut off by max_output_tokens (each retried once)
+_cap_hits_lock = threading.Lock()
+_router = ModelRouter(
+    fast_model=MODEL_FLASH,
+    strong_model=MODEL_PRO,
+    overrides=MODEL_ROUTING_OVERRIDES,
+    min_compliance=ROUTING_MIN_COMPLIANCE,
+    max_latency_ratio=ROUTING_MAX_LATENCY_RATIO,
+    max_latency_s=ROUTING_MAX_LATENCY_SECONDS,
+    strong_word_limit=ROUTING_STRONG_WORD_LIMIT,
+    long_draft_words=ROUTING_LONG_DRAFT_WORDS
+)
+
+
+def call_gemini(prompt, api_key, award="", word_limit=None, draft_words=0):
+    """
+    Calls Gemini API with fallback support.
+
+    The model is picked per request by the router from the award, target
+    word limit and draft length; the other model is the fallback.
+    Concurrent calls with the same prompt and model settings (double-clicks,
+    re-clicks during the spinner, two clerks on the same draft) share a
+    single upstream call.
+
+    Args:
+        prompt (str): Prompt text
+        api_key (str): Gemini API key
+        award (str): Award name (for routing)
+        word_limit (int): Target word count (for routing and compliance)
+        draft_words (int): Length of the clerk's draft (for routing)
+
+    Returns:
+        str: Generated text, or an "AI Error: ..." message if both models fail
+    """
+    try:
+        return _call_routed(prompt, api_key, award, word_limit, draft_words)[0]
+    except Exception as e:
+        return f"AI Error: {str(e)}"
+
+
+def _call_routed(prompt, api_key, award, word_limit, draft_words):
+    """Routes, coalesces and makes the call; returns (text, model name) or raises"""
+    if MODEL_ROUTING_ENABLED:
+        models = _router.choose(award, word_limit, draft_words)
+    else:
+        models = [MODEL_PRO, MODEL_FLASH]
+    profile = get_generation_profile(award, word_limit)
+
+    key = (tuple(models), word_limit, repr(sorted(profile.items())), prompt)
+    cache_key = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def generate():
+        if not RESPONSE_CACHE_SECONDS:
+            return _generate(prompt, api_key, models, word_limit, profile)
+        # Another process may have just answered the same request
+        cached = _shared.cache_get(cache_key)
+        if cached:
+            return tuple(cached)
+        result = _generate(prompt, api_key, models, word_limit, profile)
+        _shared.cache_set(cache_key, list(result), RESPONSE_CACHE_SECONDS)
+        return result
+
+    return _inflight.do(key, generate)
+
+
+def _generate(prompt, api_key, models, word_limit, profile):
+    """Makes the upstream call, trying models in order (raises if all fail)"""
+    generation_config = build_generation_config(profile)
+
+    for i, model_name in enumerate(models):
+        try:
+            _take_quota(model_name)
+            started = time.perf_counter()
+            text = _request(get_model(model_name, api_key), prompt, generation_config)
+        except Exception:
+            if i == len(models) - 1:
+                raise
+            continue
+
+        compliant = all(check_compliance(text, word_limit).values())
+        _router.record(model_name, time.perf_counter() - started, compliant)
+        return text, model_name
+
+
+def _request(model, content, generation_config, history=None):
+    """
+    Sends one request to a model and returns the text.
+
+    With history, content is sent as the next turn of a chat. If the reply
+    stops on the output cap, it is retried once with a larger cap
+    (MAX_TOKENS_RETRY_FACTOR) rather than returning a cut-off justification.
+    """
+    def send(config):
+        if history is None:
+            return model.generate_content(content, generation_config=config)
+        return model.start_chat(history=history).send_message(content, generation_config=config)
+
+    response = send(generation_config)
+    if _hit_token_cap(response):
+        _count_cap_hit()
+        cap = generation_config["max_output_tokens"] * MAX_TOKENS_RETRY_FACTOR
+        print(f"INFO: {model.model_name} hit its output cap, retrying with max_output_tokens={cap}")
+        response = send(dict(generation_config, max_output_tokens=cap))
+    return response.text
+
+
+def set_shared_state(state):
+    """
+    Sets the backend holding the response cache and rate-limit buckets.
+
+    Args:
+        state (SharedState): See shared_state.open_shared_state
+    """
+    global _shared
+    _shared = state
+
+
+def _take_quota(model_name):
+    """Waits for a request slot in the model's shared budget; raises if none within the max wait"""
+    per_minute = MODEL_RATE_LIMITS_RPM.get(model_name)
+    if not per_minute:
+        return
+    deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT_SECONDS
+    while True:
+        wait = _shared.acquire_rate(f"gemini:{model_name}", per_minute)
+        if not wait:
+            return
+        if time.monotonic() + wait > deadline:
+            raise RuntimeError(f"{model_name} request quota reached, try again shortly")
+        time.sleep(wait)
+
+
+# --- REGENERATION SESSIONS ---
+def start_session(prompt, api_key, award="", word_limit=None, draft_words=0):
+    """
+    Generates the first version of a nominee's justification as a chat.
+
+    The returned session keeps the original prompt (rules, examples and
+    draft) and the model's answer as context, so later regenerations only
+    send the clerk's new instruction. The repeated prefix is also what
+    Gemini's implicit context caching reuses between turns.
+
+    Args:
+        Same as call_gemini
+
+    Returns:
+        tuple: (text, session) - session is None if generation failed
+    """
+    try:
+        text, model_name = _call_routed(prompt, api_key, award, word_limit, draft_words)
+    except Exception as e:
+        return f"AI Error: {str(e)}", None
+
+    session = {
+        "model": model_name,
+        "award": award,
+        "word_limit": word_limit,
+        "turns": [
+            {"role": "user", "parts": [prompt]},
+            {"role": "model", "parts": [text]},
+        ],
+    }
+    return text, session
+
+
+def continue_session(session, instructions, current_text, api_key):
+    """
+    Regenerates within a session by sending only the new instruction.
+
+    If the session's model fails (outage, quota), the revision is made with
+    a stateless redo prompt through the router instead, and the session
+    continues on whichever model answered.
+
+    Args:
+        session (dict): From start_session (updated in place on success)
+        instructions (str): Clerk's modification instructions
+        current_text (str): Justification currently on screen (may be edited)
+        api_key (str): Gemini API key
+
+    Returns:
+        str: Revised text, or an "AI Error: ..." message
+    """
+    edited_text = current_text if current_text != session["turns"][-1]["parts"][0] else None
+    turn = build_session_redo_turn(instructions, edited_text)
+    profile = get_generation_profile(session["award"], session["word_limit"])
+    history = session["turns"][:2] + session["turns"][2:][-2 * SESSION_CONTEXT_REDOS:]
+
+    def send():
+        _take_quota(session["model"])
+        started = time.perf_counter()
+        model = get_model(session["model"], api_key)
+        text = _request(model, turn, build_generation_config(profile), history=history)
+        compliant = all(check_compliance(text, session["word_limit"]).values())
+        _router.record(session["model"], time.perf_counter() - started, compliant)
+        return text
+
+    key = ("session", session["model"], repr(history), turn)
+    try:
+        text = _inflight.do(key, send)
+    except Exception as e:
+        # Session model down or over quota: a stateless redo through the router and its fallback
+        print(f"INFO: {session['model']} session turn failed ({e}), falling back to a routed redo")
+        base_text = edited_text or session["turns"][-1]["parts"][0]
+        try:
+            text, session["model"] = _call_routed(
+                build_redo_prompt(instructions, base_text), api_key,
+                session["award"], session["word_limit"], len(base_text.split())
+            )
+        except Exception as e:
+            return f"AI Error: {str(e)}"
+
+    session["turns"] = history + [
+        {"role": "user", "parts": [turn]},
+        {"role": "model", "parts": [text]},
+    ]
+    return text
+
+
+def _count_cap_hit():
+    with _cap_hits_lock:
+        _cap_hits[0] += 1
+
+
+def _hit_token_cap(response):
+    """Returns True if generation stopped because max_output_tokens was reached"""
+    candidates = getattr(response, "candidates", None) or []
+    if not candidates:
+        return False
+    return getattr(candidates[0].finish_reason, "name", "") == "MAX_TOKENS"
+
+
+def get_generation_metrics():
+    """
+    Returns process-wide generation call counters.
+
+    Returns:
+        dict: calls, upstream, coalesced, errors, in_flight and cap_hits
+              (replies cut off by the output cap), plus per-model routing
+              statistics under 'models'
+    """
+    metrics = _inflight.stats()
+    with _cap_hits_lock:
+        metrics["cap_hits"] = _cap_hits[0]
+    metrics["models"] = _router.stats()
+    return metrics
+
+
+# --- RULE CHECKS ---
+RECOMMENDATION_ENDINGS = re.compile(
+    r"(recommend|deserv|worthy of|hereby nominat|merits? (this|the) award)[^.]*[.!]?\s*$",
+    re.IGNORECASE
+)
+WORD_LIMIT_TOLERANCE = 1.1  # "Approximately N words" allows 10% over
+
+
+def check_compliance(text, word_limit=None):
+    """
+    Runs the local, deterministic rule checks on a justification.
+
+    Args:
+        text (str): Generated justification
+        word_limit (int): Target word count, if known
+
+    Returns:
+        dict: rule name -> passed (bool)
+    """
+    last_sentence = re.split(r"(?<=[.!?])\s+", text.strip())[-1] if text.strip() else ""
+    checks = {
+        "no_asterisks": "*" not in text,
+        "no_recommendation_ending": not RECOMMENDATION_ENDINGS.search(last_sentence),
+    }
+    if word_limit:
+        checks["word_limit"] = len(text.split()) <= word_limit * WORD_LIMIT_TOLERANCE
+    return checks
+
+
+OPENING_LINE = re.compile(r"^\s*Being an?\s", re.IGNORECASE)
+EXERCISE_NAMES = re.compile(r"\b(?:Ex|Exercise)\.?\s+([A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)?)")
+
+
+def check_prompt_rules(text, word_limit=None, draft=""):
+    """
+    Runs every locally checkable prompt rule (used by the evaluation harness).
+
+    Adds the opening line and exercise-name rules to check_compliance.
+    Exercise names are caught when written as "Ex/Exercise <Name>", and any
+    such name from the draft is also caught when it reappears on its own.
+
+    Args:
+        text (str): Generated justification
+        word_limit (int): Target word count, if known
+        draft (str): Draft the justification was generated from
+
+    Returns:
+        dict: rule name -> passed (bool)
+    """
+    checks = check_compliance(text, word_limit)
+    checks["opening_line"] = bool(OPENING_LINE.match(text))
+
+    leaked = bool(EXERCISE_NAMES.search(text))
+    for name in EXERCISE_NAMES.findall(draft):
+        leaked = leaked or bool(re.search(r"\b" + re.escape(name) + r"\b", text))
+    checks["no_exercise_names"] = not leaked
+    return checks
+
+
+def is_error_text(text):
+    """Returns True if text is an error message from call_gemini rather than a justification"""
+    return text.startswith("AI Error:") or text.startswith("Error:")
+
+
+# --- BATCH / EXPORT ---
+def build_entry(record, text):
+    """
+    Builds a batch / export entry from a nomination record.
+
+    Args:
+        record (dict): Nomination or history record with the ENTRY_FIELDS keys
+        text (str): Accepted justification text
+
+    Returns:
+        dict: Entry for generate_docx and update_sheet
+    """
+    entry = {field: record.get(field, "") for field in ENTRY_FIELDS}
+    entry["text"] = text
+    return entry
+
+
+def merge_export_entries(batch, current_entry):
+    """
+    Combines the accepted batch with the entry currently on screen.
+
+    The current entry is only added if the same serviceman is not already in
+    the batch (citations are ignored for this check).
+
+    Args:
+        batch (list): Accepted entries
+        current_entry (dict): Entry being exported
+
+    Returns:
+        tuple: (export entries, True if current_entry was added)
+    """
+    export_data = list(batch)
+
+    is_in_batch = any(
+        item["rank"] == current_entry["rank"] and
+        item["name"] == current_entry["name"] and
+        "(CITATION)" not in item["name"]
+        for item in export_data
+    )
+
+    if is_in_batch:
+        return export_data, False
+
+    export_data.append(current_entry)
+    return export_data, True
+
+
+# --- HEADLESS PIPELINE ---
+def nomination_id(nomination):
+    """
+    Returns a stable id for a nomination (used to resume interrupted runs).
+
+    Uses the nomination's own 'id' field if present, otherwise a hash of
+    the fields that define the write-up.
+    """
+    if nomination.get("id"):
+        return str(nomination["id"])
+
+    key = "|".join(
+        str(nomination.get(field, ""))
+        for field in ("rank", "name", "award", "unit", "month", "draft")
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def generate_for_nomination(nomination, api_key):
+    """
+    Runs prompt construction and generation for one nomination.
+
+    Args:
+        nomination (dict): Fields rank, name, award, draft and optionally
+                           preferred_name, role, unit, month, word_limit,
+                           ippt, bmi, atp, previous_awards
+        api_key (str): Gemini API key
+
+    Returns:
+        dict: Export entry plus 'id', 'error' and 'elapsed_s'
+    """
+    award = nomination.get("award", "")
+    name = nomination.get("name", "").upper().strip()
+    preferred_name = (nomination.get("preferred_name") or name.split(" ")[-1]).upper()
+
+    prompt = build_prompt(
+        award=award,
+        role=nomination.get("role", ""),
+        unit=nomination.get("unit", ""),
+        rank=nomination.get("rank", ""),
+        full_name=name,
+        preferred_name=preferred_name,
+        award_rule_text=get_award_rule_text(award, nomination.get("word_limit", "")),
+        draft=nomination.get("draft", "")
+    )
+
+    started = time.perf_counter()
+    text = call_gemini(
+        prompt,
+        api_key,
+        award=award,
+        word_limit=get_word_limit(award, nomination.get("word_limit", "")),
+        draft_words=len(nomination.get("draft", "").split())
+    )
+    elapsed = time.perf_counter() - started
+
+    result = build_entry(dict(nomination, name=name), text)
+    result["id"] = nomination_id(nomination)
+    result["error"] = text if is_error_text(text) else None
+    result["elapsed_s"] = round(elapsed, 3)
+    return result
@@ -0,0 +1,217 @@
+"""
+Local fallback justification, assembled without the model.
+
+Used when Gemini is unavailable or slow, so a clerk always has a draft
+to work from. The text follows the structure of the award's examples:
+an opening line "Being a/an <adjective> <role> in <unit>." (adjectives
+taken from the examples' own opening lines), then a paragraph led by
+"<RANK> <NAME>". Sentences come from the clerk's draft: bullet fragments
+are folded into one sentence led by the name, sentences with concrete
+achievements (numbers, leadership, safety, ...) are preferred, and the
+result is compressed to the word limit. Asterisks, exercise names and
+recommendation endings are removed, so the prompt's rules still hold.
+"""
+import re
+import zlib
+
+from awards import get_examples_for_award
+from core import EXERCISE_NAMES, RECOMMENDATION_ENDINGS, DEFAULT_WORD_LIMIT
+
+# ============================================================================
+# FALLBACK WRITING RULES
+# ============================================================================
+FALLBACK_ADJECTIVES = ("exemplary", "outstanding", "dedicated")  # When the award has no examples
+FALLBACK_EXERCISE_TEXT = "an exercise"                            # Replaces "Ex <Name>"
+FALLBACK_GENERIC_LINE = "{subject} has carried out the duties of the role with dedication and professionalism."
+
+# Draft phrases shortened when compressing (pattern, replacement)
+COMPRESSIONS = (
+    (r"\bin order to\b", "to"),
+    (r"\bdue to the fact that\b", "because"),
+    (r"\ba lot of\b", "many"),
+    (r"\blots of\b", "many"),
+    (r"\bat this point in time\b", "now"),
+    (r"\b(?:very|really|basically|actually|quite)\s+", ""),
+    (r"\s*\([^)]*\)", ""),
+)
+
+# Words that show a draft sentence is worth keeping
+ACHIEVEMENT_WORDS = re.compile(
+    r"\b(?:led|lead|leads|leading|mentor\w*|safety|safe|initiative|zero|record|award\w*|"
+    r"commend\w*|excellen\w*|overseas|exercise|guid\w*|train\w*|volunteer\w*|km|kilomet\w*)\b",
+    re.IGNORECASE
+)
+
+# First words of draft lines that are already full sentences
+SENTENCE_STARTERS = {
+    "he", "she", "they", "his", "her", "their", "the", "this", "these", "a", "an",
+    "as", "in", "on", "during", "with", "being", "beyond", "despite", "since", "also",
+    "apart", "besides", "throughout", "while", "when", "after", "before", "through", "at",
+}
+# First words of bullet fragments ("Managed 40 vehicles")
+FRAGMENT_VERBS = {"has", "is", "was", "led", "ran", "won", "took", "made", "kept", "drove",
+                  "taught", "built", "oversaw", "undertook", "holds", "leads", "keeps"}
+
+
+def build_fallback_justification(award, role, unit, rank, preferred_name, draft, word_limit=None):
+    """
+    Assembles a rule-compliant justification from the draft without the model.
+
+    Args:
+        award (str): Award name (selects the examples)
+        role (str): Serviceman vocation
+        unit (str): Company / Node
+        rank (str): Rank
+        preferred_name (str): Name used in the text (as in the prompt)
+        draft (str): Clerk's draft write-up
+        word_limit (int): Target word count
+
+    Returns:
+        str: Justification text
+    """
+    word_limit = word_limit or DEFAULT_WORD_LIMIT
+    subject = f"{rank} {preferred_name}".strip()
+    opening = _opening_line(award, role, unit, subject)
+
+    sentences = _draft_sentences(_strip_exercise_names(draft), subject)
+    budget = word_limit - len(opening.split())
+    body = _select(sentences, budget)
+    return f"{opening}\n\n{' '.join(body)}"
+
+
+def _opening_line(award, role, unit, subject):
+    """'Being a/an <adjective> <role> in <unit>.' with an adjective from the award's examples"""
+    adjectives = []
+    for example in get_examples_for_award(award):
+        match = re.match(r"\s*Being an? ([a-z]+)\b", example)
+        if match and match.group(1) not in ("highly", "very"):
+            adjectives.append(match.group(1))
+    adjectives = sorted(set(adjectives)) or list(FALLBACK_ADJECTIVES)
+    # Stable per nominee, varied across nominees
+    adjective = adjectives[zlib.crc32(subject.encode("utf-8")) % len(adjectives)]
+    article = "an" if adjective[0] in "aeiou" else "a"
+
+    role = re.sub(r"\s*\([^)]*\)", "", role or "").strip()
+    if not role or role.lower() in ("others", "other"):
+        role = "serviceman"
+    line = f"Being {article} {adjective} {role}"
+    if unit:
+        line += f" in {unit}"
+    return line + "."
+
+
+def _strip_exercise_names(draft):
+    """Replaces 'Ex <Name>' with a plain mention, and drops the bare names elsewhere"""
+    # Line by line, so a name at the end of a bullet does not swallow the next line
+    lines = draft.splitlines()
+    names = [name for line in lines for name in EXERCISE_NAMES.findall(line)]
+    text = "\n".join(EXERCISE_NAMES.sub(FALLBACK_EXERCISE_TEXT, line) for line in lines)
+    for name in names:
+        text = re.sub(r"\b" + re.escape(name) + r"\b", "the exercise", text)
+    # "Ex A and Ex B" -> "an exercise and an exercise" -> "several exercises"
+    repeated = re.escape(FALLBACK_EXERCISE_TEXT)
+    return re.sub(rf"{repeated}(?:(?:,| and| or)\s+{repeated})+", "several exercises", text)
+
+
+def _draft_sentences(draft, subject):
+    """
+    Splits the draft into clean third-person sentences, the name-led one first.
+
+    Sentences opening with the rank / name are rewritten to use the subject
+    as in the prompt; bullet fragments ("- managed 40 vehicles") are joined
+    into one sentence led by the subject. A leading "He"/"She" is replaced
+    by the subject if nothing else leads with the name.
+    """
+    subject_words = subject.lower().split()
+    lead, fragments, sentences = None, [], []
+    for line in draft.replace("*", " ").splitlines():
+        line = re.sub(r"^\s*(?:[-•>]+|\d+[.)])\s*", "", line).strip()
+        for piece in re.split(r"(?<=[.!?;])\s+", line):
+            words = " ".join(piece.split()).rstrip(".!?;, ").split()
+            if len(words) < 3 or RECOMMENDATION_ENDINGS.search(" ".join(words)):
+                continue
+            first = words[0].lower()
+            if first in subject_words and lead is None:
+                lead = f"{subject} {' '.join(_drop_name(words, subject_words))}."
+            elif first in SENTENCE_STARTERS or first in subject_words:
+                sentences.append(" ".join([words[0][0].upper() + words[0][1:]] + words[1:]) + ".")
+            elif first.endswith("ed") or first in FRAGMENT_VERBS:
+                fragments.append(" ".join([first] + words[1:]))
+            else:
+                sentences.append(" ".join([words[0][0].upper() + words[0][1:]] + words[1:]) + ".")
+
+    if fragments:
+        listed = fragments[0] if len(fragments) == 1 else ", ".join(fragments[:-1]) + " and " + fragments[-1]
+        sentences.insert(0, f"{subject} {'also ' if lead else ''}{listed}.")
+    if lead is None:
+        for i, sentence in enumerate(sentences):
+            if not fragments and re.match(r"(?:He|She|They)\s", sentence):
+                sentences.pop(i)
+                lead = f"{subject} {sentence.split(' ', 1)[1]}"
+                break
+    if lead is not None:
+        sentences.insert(0, lead)
+    elif not fragments:
+        sentences.insert(0, FALLBACK_GENERIC_LINE.format(subject=subject))
+    return sentences
+
+
+def _drop_name(words, subject_words):
+    """Removes the rank / name at the start of a draft sentence ("cpl tan is ..." -> "is ...")"""
+    i = 0
+    while i < len(words) and words[i].lower() in subject_words:
+        i += 1
+    if all(w.lower() == subject_words[0] for w in words[:i]):
+        i += 1  # Rank followed by another form of the name ("CPL Ng")
+    return words[i:]
+
+
+def _score(sentence):
+    """Prefers concrete, quantified achievements of moderate length"""
+    words = len(sentence.split())
+    return (2 * bool(re.search(r"\d", sentence))
+            + len(ACHIEVEMENT_WORDS.findall(sentence))
+            + (8 <= words <= 35))
+
+
+def _compress(sentence):
+    for pattern, replacement in COMPRESSIONS:
+        sentence = re.sub(pattern, replacement, sentence, flags=re.IGNORECASE)
+    return " ".join(sentence.split()).replace(" .", ".").replace(" ,", ",")
+
+
+def _shorten(sentence, budget):
+    """Cuts a sentence at the last clause boundary within budget words (None if too short)"""
+    words = sentence.rstrip(".").split()[:budget]
+    text = " ".join(words)
+    cut = max(text.rfind(","), text.rfind(";"), text.rfind(" and "))
+    if cut > 0:
+        text = text[:cut]
+    return text.rstrip(",; ") + "." if len(text.split()) >= 5 else None
+
+
+def _select(sentences, budget):
+    """
+    Picks the best sentences that fit the word budget, in draft order.
+
+    The first (name-led) sentence is always kept, shortened if needed.
+    """
+    sentences = [_compress(s) for s in sentences]
+    lead = sentences[0]
+    if len(lead.split()) > budget:
+        lead = _shorten(lead, budget) or " ".join(lead.split()[:budget]).rstrip(",;.") + "."
+    chosen = {0: lead}
+    remaining = budget - len(lead.split())
+
+    ranked = sorted(range(1, len(sentences)), key=lambda i: (-_score(sentences[i]), i))
+    for i in ranked:
+        words = len(sentences[i].split())
+        if words <= remaining:
+            chosen[i] = sentences[i]
+            remaining -= words
+        elif remaining >= 10:
+            shortened = _shorten(sentences[i], remaining)
+            if shortened:
+                chosen[i] = shortened
+                remaining -= len(shortened.split())
+    return [chosen[i] for i in sorted(chosen)]
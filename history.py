@@ -0,0 +1,200 @@
+from collections import OrderedDict
+
+
+# ============================================================================
+# SUBJECT FIELDS - Metadata stored once per nominee instead of per version
+# ============================================================================
+SUBJECT_FIELDS = (
+    "rank", "name", "award", "unit", "month",
+    "ippt", "bmi", "atp", "previous_awards"
+)
+
+
+def _encode_delta(base_text, text):
+    """
+    Encodes text as an edit of base_text.
+
+    Only the changed middle section is stored, together with the lengths of
+    the prefix and suffix shared with base_text. Regenerated versions of the
+    same justification usually share their opening and closing lines.
+
+    Returns:
+        tuple: (prefix_len, suffix_len, middle), or None if a delta
+               would not be smaller than the full text
+    """
+    limit = min(len(base_text), len(text))
+
+    prefix = 0
+    while prefix < limit and base_text[prefix] == text[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while (suffix < limit - prefix
+           and base_text[-1 - suffix] == text[-1 - suffix]):
+        suffix += 1
+
+    middle = text[prefix:len(text) - suffix]
+    if len(middle) >= len(text):
+        return None
+    return (prefix, suffix, middle)
+
+
+def _apply_delta(base_text, delta):
+    """Rebuilds a text from its base and a delta produced by _encode_delta"""
+    prefix, suffix, middle = delta
+    tail = base_text[len(base_text) - suffix:] if suffix else ""
+    return base_text[:prefix] + middle + tail
+
+
+class VersionHistory:
+    """
+    Compact, bounded version history shared by every nominee in a session.
+
+    Subject metadata (rank, name, award, unit, month, stats) is stored once
+    per nominee. Each version is a small record holding only the
+    justification text, optionally delta-encoded against the nominee's
+    previous version.
+
+    Versions keep the order in which they were generated, so position based
+    Previous/Next navigation works exactly like a plain list. Old versions
+    beyond the per-nominee cap are dropped, and the least recently used
+    nominee is evicted once more than max_nominees are held.
+    """
+
+    def __init__(self, max_versions_per_nominee=10, max_nominees=25, delta_encoding=True):
+        """
+        Args:
+            max_versions_per_nominee (int): Versions kept for each nominee
+            max_nominees (int): Nominees kept before LRU eviction
+            delta_encoding (bool): Store versions as edits of the previous one
+        """
+        self.max_versions_per_nominee = max_versions_per_nominee
+        self.max_nominees = max_nominees
+        self.delta_encoding = delta_encoding
+
+        self._subjects = OrderedDict()   # subject key -> list of version ids
+        self._records = {}               # version id -> [subject key, base id, payload]
+        self._order = []                 # version ids in generation order
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    # --- Public API ---
+    def append(self, subject, text, vid=None):
+        """
+        Adds a new version for a nominee.
+
+        Args:
+            subject (dict): Nominee metadata with the keys in SUBJECT_FIELDS
+            text (str): Justification text of the new version
+            vid (int): Version id assigned by a persistent store, if any
+
+        Returns:
+            int: Position of the new version (for curr_idx)
+        """
+        key = tuple(subject.get(field, "") for field in SUBJECT_FIELDS)
+        vids = self._subjects.setdefault(key, [])
+        self._subjects.move_to_end(key)
+
+        if vid is None:
+            vid = self._next_id
+        self._next_id = max(self._next_id, vid + 1)
+        self._records[vid] = self._make_record(key, vids[-1] if vids else None, text)
+        vids.append(vid)
+        self._order.append(vid)
+
+        # Per-nominee cap: drop the oldest versions of this nominee
+        while len(vids) > self.max_versions_per_nominee:
+            self._drop_version(vids[0])
+
+        # LRU eviction of whole nominees (never the one just used)
+        while len(self._subjects) > self.max_nominees:
+            oldest_key = next(iter(self._subjects))
+            for old_vid in list(self._subjects[oldest_key]):
+                self._drop_version(old_vid)
+
+        return len(self._order) - 1
+
+    def get(self, pos):
+        """
+        Returns a version as a flat record.
+
+        Args:
+            pos (int): Position in the history
+
+        Returns:
+            dict: Subject metadata plus the justification under 'brief'
+                  and the stable version id under 'vid'
+        """
+        vid = self._order[pos]
+        key = self._records[vid][0]
+        self._subjects.move_to_end(key)
+
+        record = dict(zip(SUBJECT_FIELDS, key))
+        record["brief"] = self._text(vid)
+        record["vid"] = vid
+        return record
+
+    def set_text(self, pos, text):
+        """
+        Replaces the justification text of an existing version.
+
+        Args:
+            pos (int): Position in the history
+            text (str): New justification text
+        """
+        vid = self._order[pos]
+        key, base_vid, _ = self._records[vid]
+
+        # Later versions encoded against this one must not see the change
+        self._materialize_dependents(vid)
+        self._records[vid] = self._make_record(key, base_vid, text)
+
+    def position(self, vid):
+        """Returns the current position of a version id, or None if it has been dropped"""
+        try:
+            return self._order.index(vid)
+        except ValueError:
+            return None
+
+    def clear(self):
+        """Removes every nominee and version"""
+        self._subjects.clear()
+        self._records.clear()
+        self._order.clear()
+
+    # --- Internal helpers ---
+    def _make_record(self, key, base_vid, text):
+        """Builds a version record, delta-encoded when that saves space"""
+        if self.delta_encoding and base_vid is not None:
+            delta = _encode_delta(self._text(base_vid), text)
+            if delta is not None:
+                return [key, base_vid, delta]
+        return [key, None, text]
+
+    def _text(self, vid):
+        """Decodes the full text of a version"""
+        _, base_vid, payload = self._records[vid]
+        if base_vid is None:
+            return payload
+        return _apply_delta(self._text(base_vid), payload)
+
+    def _materialize_dependents(self, vid):
+        """Rewrites versions encoded against vid as full text"""
+        key = self._records[vid][0]
+        for other in self._subjects[key]:
+            record = self._records[other]
+            if record[1] == vid:
+                self._records[other] = [key, None, self._text(other)]
+
+    def _drop_version(self, vid):
+        """Removes a single version, keeping dependent versions decodable"""
+        key = self._records[vid][0]
+        self._materialize_dependents(vid)
+
+        del self._records[vid]
+        self._order.remove(vid)
+        self._subjects[key].remove(vid)
+        if not self._subjects[key]:
+            del self._subjects[key]
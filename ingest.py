@@ -0,0 +1,316 @@
+"""
+Bulk ingestion of unit nomination documents.
+
+Units send rough nominations as .docx files (one nominee per file, often
+several files zipped together). This module turns them into pending
+nominations with the same fields the CLI reads (rank, name, award, unit,
+draft, ...), so they can be loaded into the form or fed to
+`python -m safaisa generate`.
+
+Files are parsed one at a time across a thread pool; zip members are read
+lazily and only a bounded number of documents are held in memory at once.
+"""
+import os
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
+
+from core import nomination_id
+
+
+# ============================================================================
+# INGESTION CONFIGURATION
+# ============================================================================
+INGEST_WORKERS = 4              # Documents parsed in parallel
+INGEST_MAX_IN_FLIGHT = 16       # Documents read ahead of the workers (bounds memory)
+INGEST_MAX_FILE_MB = 20         # Larger documents are skipped
+
+# ============================================================================
+# EXTRACTION HEURISTICS
+# ============================================================================
+# "Label: value" lines (or two-cell table rows) are matched against these
+# labels, case-insensitively. The first matching label wins for each field.
+INGEST_FIELD_LABELS = {
+    "rank": ["rank"],
+    "name": ["full name", "name of serviceman", "nominee", "name"],
+    "preferred_name": ["preferred name", "first name"],
+    "award": ["award type", "award"],
+    "unit": ["company / node", "company", "coy", "node", "unit"],
+    "role": ["vocation", "appointment", "role"],
+    "ippt": ["ippt score", "ippt"],
+    "bmi": ["bmi"],
+    "atp": ["atp score", "atp"],
+    "previous_awards": ["previous awards"],
+    "draft": ["draft write-up", "write-up", "writeup", "justification", "achievements", "draft"],
+}
+
+# Ranks recognised in free text ("CPL TAN AH KOW") when there is no rank/name label
+INGEST_RANKS = [
+    "REC", "PTE", "LCP", "CPL", "CFC", "3SG", "2SG", "1SG", "SSG", "MSG",
+    "3WO", "2WO", "1WO", "MWO", "SWO", "CWO",
+    "ME1", "ME2", "ME3", "ME4", "ME5", "ME6", "ME7", "ME8",
+    "2LT", "LTA", "CPT", "MAJ", "LTC", "SLTC", "COL",
+]
+
+# Award names as written by units -> award name used by the app
+INGEST_AWARD_ALIASES = {
+    "CO Coin": ["co coin", "commanding officer coin", "co's coin"],
+    "RSM Coin": ["rsm coin", "regimental sergeant major coin", "rsm's coin"],
+    "CTO Coin": ["cto coin", "chief transport officer coin"],
+    "FSM Coin": ["fsm coin", "formation sergeant major coin"],
+    "BSOM": ["bsom", "best soldier of the month", "best serviceman of the month"],
+}
+
+MIN_DRAFT_WORDS = 15  # Shorter drafts are flagged for the clerk to check
+# ============================================================================
+
+_RANK_NAME = re.compile(
+    r"\b(" + "|".join(re.escape(r) for r in INGEST_RANKS) + r")\.?\s+([A-Z][A-Z'\-/@ ]{2,60}[A-Z])\b"
+)
+_SEPARATOR = r"\s*:\s*|\s+[\-–—]\s+"
+
+
+# --- DOCUMENT TEXT ---
+def extract_docx_lines(data):
+    """
+    Returns the text of a .docx as lines, in document order.
+
+    Paragraphs become one line each. Table rows become "cell: cell" lines
+    so that form-style tables (label cell, value cell) read the same as
+    "Label: value" paragraphs.
+
+    Args:
+        data (bytes): .docx file content
+
+    Returns:
+        list: Non-empty lines
+    """
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(BytesIO(data))
+    lines = []
+
+    for child in doc.element.body.iterchildren():
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            lines.append(Paragraph(child, doc).text)
+        elif tag == "tbl":
+            for row in Table(child, doc).rows:
+                cells = []
+                for cell in row.cells:
+                    text = cell.text.strip()
+                    if text and (not cells or cells[-1] != text):  # Merged cells repeat
+                        cells.append(text)
+                lines.append(": ".join(cells))
+
+    return [line.strip() for line in lines if line and line.strip()]
+
+
+# --- FIELD EXTRACTION ---
+def _match_label(line):
+    """Returns (field, value) if the line is "Label: value" for a known label"""
+    for field, labels in INGEST_FIELD_LABELS.items():
+        for label in labels:
+            m = re.match(re.escape(label) + r"\b(?:" + _SEPARATOR + r"|\s*$)(.*)$", line, re.IGNORECASE)
+            if m:
+                return field, m.group(1).strip()
+    return None, None
+
+
+def match_award(text):
+    """
+    Maps free text to one of the app's award names.
+
+    Args:
+        text (str): Award label value, document text or filename
+
+    Returns:
+        str: Award name, or "" if none matched
+    """
+    lowered = re.sub(r"[_\-]+", " ", text.lower())
+    for award, aliases in INGEST_AWARD_ALIASES.items():
+        if any(re.search(r"\b" + re.escape(alias) + r"\b", lowered) for alias in aliases):
+            return award
+    return ""
+
+
+def parse_nomination(lines, filename=""):
+    """
+    Extracts a nomination from a document's lines.
+
+    Labelled lines fill their fields; a label with no value on its line
+    takes the next line (or, for a "Draft Write-up" heading, every line
+    up to the next label). Lines that are not labelled form the draft.
+    Rank and name fall back to the first "RANK NAME" in the text, and the
+    award to the document text and then the filename.
+
+    Args:
+        lines (list): Document lines from extract_docx_lines
+        filename (str): Source filename (used for the award fallback)
+
+    Returns:
+        dict: Nomination fields plus 'source', 'id' and 'warnings'
+    """
+    fields = {}
+    collected = {}   # Multi-line values under a heading label
+    draft_lines = []
+    current = None
+
+    for line in lines:
+        field, value = _match_label(line)
+        if field and field not in fields:
+            if value:
+                fields[field] = value
+                current = None
+            else:
+                current = field
+                collected.setdefault(field, [])
+            continue
+
+        if current:
+            collected[current].append(line)
+            if current != "draft":
+                current = None  # Only the draft heading spans several lines
+        else:
+            draft_lines.append(line)
+
+    for field, values in collected.items():
+        if values and not fields.get(field):
+            fields[field] = "\n".join(values) if field == "draft" else " ".join(values)
+
+    if not fields.get("rank") or not fields.get("name"):
+        m = _RANK_NAME.search(fields.get("name", "") or "\n".join(lines))
+        if m:
+            fields.setdefault("rank", m.group(1))
+            if not fields.get("name") or fields["name"].upper().startswith(m.group(1)):
+                fields["name"] = m.group(2)
+
+    if not fields.get("draft"):
+        # Title lines ("RSM COIN NOMINATION", "CPL TAN AH KOW") are not part of the draft
+        fields["draft"] = "\n".join(
+            line for line in draft_lines
+            if not (len(line.split()) <= 6 and (match_award(line) or _RANK_NAME.match(line)))
+        )
+
+    if fields.get("rank") and fields.get("name", "").upper().startswith(fields["rank"].upper() + " "):
+        fields["name"] = fields["name"][len(fields["rank"]):].strip()
+
+    award = match_award(fields.get("award", ""))
+    if not award and fields.get("award"):
+        award = fields["award"]  # Unknown award: kept as written, loaded as OTHER
+    award = award or match_award("\n".join(lines)) or match_award(os.path.basename(filename))
+
+    nomination = {
+        "rank": fields.get("rank", "").upper().strip(),
+        "name": fields.get("name", "").upper().strip(),
+        "preferred_name": fields.get("preferred_name", "").upper().strip(),
+        "award": award,
+        "unit": fields.get("unit", "").strip(),
+        "role": fields.get("role", "").strip(),
+        "ippt": fields.get("ippt", "").strip(),
+        "bmi": fields.get("bmi", "").strip(),
+        "atp": fields.get("atp", "").strip(),
+        "previous_awards": fields.get("previous_awards", "").strip(),
+        "draft": fields.get("draft", "").strip(),
+        "source": filename,
+    }
+
+    warnings = []
+    for field in ("rank", "name", "award"):
+        if not nomination[field]:
+            warnings.append(f"no {field} found")
+    if len(nomination["draft"].split()) < MIN_DRAFT_WORDS:
+        warnings.append("draft looks too short")
+
+    nomination["id"] = nomination_id(nomination)
+    nomination["warnings"] = warnings
+    return nomination
+
+
+# --- FILE SOURCES ---
+def iter_documents(sources):
+    """
+    Yields (filename, bytes) for every .docx in the sources, expanding zips.
+
+    Zip members are read one at a time as the caller consumes them. Word
+    lock files (~$...) and macOS metadata are skipped.
+
+    Args:
+        sources (iterable): (filename, bytes, binary file object or path)
+                            pairs, e.g. Streamlit uploads as (f.name, f)
+
+    Yields:
+        tuple: (filename, bytes), or (filename, Exception) for unreadable input
+    """
+    max_bytes = INGEST_MAX_FILE_MB * 1024 * 1024
+
+    for filename, content in sources:
+        lowered = filename.lower()
+        try:
+            if lowered.endswith(".zip"):
+                fileobj = BytesIO(content) if isinstance(content, bytes) else content
+                with zipfile.ZipFile(fileobj) as archive:  # Also accepts a path
+                    for info in archive.infolist():
+                        base = os.path.basename(info.filename)
+                        if info.is_dir() or not base.lower().endswith(".docx") or base.startswith("~$") \
+                                or info.filename.startswith("__MACOSX/"):
+                            continue
+                        if info.file_size > max_bytes:
+                            yield info.filename, ValueError(f"larger than {INGEST_MAX_FILE_MB} MB")
+                            continue
+                        yield info.filename, archive.read(info)
+            elif lowered.endswith(".docx") and not os.path.basename(lowered).startswith("~$"):
+                if isinstance(content, str):
+                    with open(content, "rb") as f:
+                        data = f.read()
+                else:
+                    data = content if isinstance(content, bytes) else content.read()
+                if len(data) > max_bytes:
+                    yield filename, ValueError(f"larger than {INGEST_MAX_FILE_MB} MB")
+                    continue
+                yield filename, data
+        except (zipfile.BadZipFile, OSError) as e:
+            yield filename, e
+
+
+def _parse_document(filename, data):
+    """Worker: parses one document into a nomination (errors are returned, not raised)"""
+    if isinstance(data, Exception):
+        return {"source": filename, "error": str(data)}
+    try:
+        return parse_nomination(extract_docx_lines(data), filename)
+    except Exception as e:
+        return {"source": filename, "error": f"could not read document ({e})"}
+
+
+def ingest(sources, workers=INGEST_WORKERS, max_in_flight=INGEST_MAX_IN_FLIGHT):
+    """
+    Parses documents across a worker pool, yielding nominations as they finish.
+
+    Args:
+        sources (iterable): (filename, content) pairs as for iter_documents
+        workers (int): Parser threads
+        max_in_flight (int): Documents read ahead of the workers
+
+    Yields:
+        dict: A nomination from parse_nomination, or {'source', 'error'}
+              for files that could not be read
+    """
+    documents = iter_documents(sources)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for filename, data in documents:
+            pending.add(pool.submit(_parse_document, filename, data))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
@@ -0,0 +1,258 @@
+"""
+In-memory fuzzy index of servicemen in the tracking sheet.
+
+Built from the tracking sheet rows ([RANK, NAME, COY/NODE, AWARD, MONTH,
+STATUS, PRESENTATION DATE]) and grouped per serviceman, so a name typed
+in the form can be matched to previous awards, unit and rank without any
+Sheets API call on the lookup path.
+
+Names are indexed by character trigrams. A lookup first looks for names
+containing all of the query's trigrams and relaxes the threshold in tiers
+only when too few are found; each tier only scores the servicemen sharing
+one of the query's rarest trigrams (prefix filtering). Those postings are
+grouped by name length and scored shortest first, so a common surname
+("TAN") stops after the first few full matches instead of scoring every
+TAN. This keeps lookups
+under a millisecond at tens of thousands of rows.
+Refreshes fetch only rows added since the last fetch and run off the
+script thread; a full reload periodically picks up edits and deletions.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+
+# Overlap counts use bitmasks of trigram ids; int.bit_count needs Python 3.10+
+_popcount = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+
+def normalize_name(name):
+    """Upper-cases a name and collapses punctuation / whitespace ("Tan  Ah-Kow" -> "TAN AH KOW")"""
+    return " ".join(re.sub(r"[^A-Z0-9/@' ]+", " ", str(name).upper()).split())
+
+
+def trigrams(name):
+    """Returns the set of character trigrams of a normalized name (word-boundary padded)"""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NomineeIndex:
+    """
+    Thread-safe fuzzy name index over tracking sheet rows.
+
+    Rows are grouped by normalized name; each serviceman keeps their latest
+    rank and unit and every distinct (award, month) received.
+    """
+
+    def __init__(self, min_similarity=0.5, exclude_statuses=()):
+        """
+        Args:
+            min_similarity (float): Share of the query's trigrams a name must
+                                    contain to be returned (0-1)
+            exclude_statuses (iterable): STATUS values whose rows are not
+                                         counted as awards received
+        """
+        self.min_similarity = min_similarity
+        self.exclude_statuses = {s.upper() for s in exclude_statuses}
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._people = []      # person id -> record dict
+        self._by_name = {}     # normalized name -> person id
+        self._bits = {}        # trigram -> bit number
+        self._masks = []       # person id -> bitmask of the name's trigrams
+        self._sizes = []       # person id -> number of trigrams in the name
+        self._postings = {}    # trigram -> list of person ids
+        self._postings_by_size = {}  # trigram -> name trigram count -> person ids
+        self.rows_loaded = 0   # Sheet rows fetched so far (next incremental fetch starts after these)
+        self.loaded_at = 0.0
+        self.full_loaded_at = 0.0
+
+    # --- BUILDING ---
+    def add_rows(self, rows):
+        """
+        Adds tracking rows (incremental; duplicate awards are ignored).
+
+        Args:
+            rows (list): Rows in tracking sheet column order
+        """
+        with self._lock:
+            for row in rows:
+                self._add_row(list(row) + [""] * (6 - len(row)))
+
+    def _add_row(self, row):
+        rank, name, unit, award, month, status = (str(v).strip() for v in row[:6])
+        key = normalize_name(name)
+        if not key or key == "NAME":  # Blank or header row
+            return
+
+        pid = self._by_name.get(key)
+        if pid is None:
+            pid = len(self._people)
+            self._by_name[key] = pid
+            self._people.append({"name": key, "rank": "", "unit": "", "awards": {}})
+            grams = trigrams(key)
+            mask = 0
+            for gram in grams:
+                mask |= 1 << self._bits.setdefault(gram, len(self._bits))
+                self._postings.setdefault(gram, []).append(pid)
+                self._postings_by_size.setdefault(gram, {}).setdefault(len(grams), []).append(pid)
+            self._masks.append(mask)
+            self._sizes.append(len(grams))
+
+        person = self._people[pid]
+        # Sheet rows are appended in time order, so later rows carry the current rank / unit
+        person["rank"] = rank or person["rank"]
+        person["unit"] = unit or person["unit"]
+        if award and status.upper() not in self.exclude_statuses:
+            person["awards"].setdefault((award, month), None)
+
+    def replace(self, rows):
+        """Rebuilds the index from a full set of rows"""
+        fresh = NomineeIndex(self.min_similarity, self.exclude_statuses)
+        fresh.add_rows(rows)
+        with self._lock:
+            self._people, self._by_name, self._postings = fresh._people, fresh._by_name, fresh._postings
+            self._postings_by_size = fresh._postings_by_size
+            self._bits, self._masks, self._sizes = fresh._bits, fresh._masks, fresh._sizes
+
+    def __len__(self):
+        return len(self._people)
+
+    # --- REFRESH ---
+    def refresh(self, fetch_rows, full=False):
+        """
+        Fetches new rows (or all rows) and adds them to the index.
+
+        Args:
+            fetch_rows (callable): start_row -> rows from that 1-based sheet
+                                   row onwards (see utils.fetch_tracking_rows)
+            full (bool): Reload everything instead of only new rows
+        """
+        with self._refresh_lock:
+            if full or not self.rows_loaded:
+                rows = fetch_rows(1)
+                self.replace(rows)
+                self.rows_loaded = len(rows)
+                self.full_loaded_at = time.monotonic()
+            else:
+                rows = fetch_rows(self.rows_loaded + 1)
+                self.add_rows(rows)
+                self.rows_loaded += len(rows)
+            self.loaded_at = time.monotonic()
+            print(f"INFO: Nominee index has {len(self)} servicemen ({self.rows_loaded} sheet rows)")
+
+    def refresh_in_background(self, fetch_rows, max_age, full_reload_age):
+        """
+        Starts a refresh on a daemon thread if the index is older than max_age.
+
+        Never blocks: if a refresh is already running this returns at once.
+
+        Args:
+            fetch_rows (callable): As for refresh
+            max_age (float): Seconds before new rows are fetched
+            full_reload_age (float): Seconds before everything is reloaded
+        """
+        now = time.monotonic()
+        if self.loaded_at and now - self.loaded_at < max_age:
+            return
+        if self._refresh_lock.locked():
+            return
+        self.loaded_at = now  # Claimed: other sessions skip until this one finishes
+
+        full = now - self.full_loaded_at >= full_reload_age
+
+        def _run():
+            try:
+                self.refresh(fetch_rows, full=full)
+            except Exception as e:
+                print(f"WARNING: Nominee index refresh failed: {e}")
+
+        threading.Thread(target=_run, name="nominee-index-refresh", daemon=True).start()
+
+    # --- LOOKUP ---
+    def search(self, query, limit=5, exclude_award=None):
+        """
+        Returns the servicemen whose names best match the query.
+
+        Args:
+            query (str): Name as typed (any case / spacing)
+            limit (int): Maximum matches
+            exclude_award (tuple): (award, month) to leave out of previous
+                                   awards, i.e. the nomination being written
+
+        Returns:
+            list: dicts with name, rank, unit, previous_awards (comma
+                  separated, oldest first) and score (share of the query's
+                  trigrams found in the name, 0-1), best first
+        """
+        key = normalize_name(query)
+        if len(key) < 3:
+            return []
+        query_grams = trigrams(key)
+
+        with self._lock:
+            scored = []
+            for threshold in self._tiers():
+                scored = self._score(query_grams, threshold, limit)
+                if len(scored) >= limit or (scored and threshold == 1.0):
+                    # Anything below this tier matches fewer of the query's trigrams;
+                    # names containing the whole query need no fuzzy alternatives
+                    break
+
+            matches = []
+            for score, _, pid in scored[:limit]:
+                person = self._people[pid]
+                awards = [award for (award, month) in person["awards"] if (award, month) != exclude_award]
+                matches.append({
+                    "name": person["name"],
+                    "rank": person["rank"],
+                    "unit": person["unit"],
+                    "previous_awards": ", ".join(dict.fromkeys(awards)),
+                    "score": score,
+                })
+        return matches
+
+    def _tiers(self):
+        """Containment thresholds tried in turn, strictest first"""
+        return [t for t in (1.0, 0.8, 0.65) if t > self.min_similarity] + [self.min_similarity]
+
+    def _score(self, query_grams, threshold, limit):
+        """
+        Scores the best names containing at least `threshold` of the query's trigrams.
+
+        Returns:
+            list: Up to `limit` (containment, dice, person id), best first
+        """
+        # A name sharing at least `needed` of the query's n trigrams must
+        # contain one of the (n - needed + 1) rarest ones
+        n = len(query_grams)
+        needed = max(1, math.ceil(threshold * n))
+        ranked = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+
+        query_mask = 0
+        for gram in query_grams:
+            if gram in self._bits:
+                query_mask |= 1 << self._bits[gram]
+        best_common = _popcount(query_mask)  # Most trigrams any indexed name can share
+        if best_common < needed:
+            return []
+
+        # Candidates are scored shortest names first, i.e. in Dice order within a
+        # containment level: once `limit` names share every trigram any name can,
+        # no longer name can rank above them
+        by_size = [self._postings_by_size.get(gram, {}) for gram in ranked[:n - needed + 1]]
+        scored, top_hits = [], 0
+        masks = self._masks
+        for size in sorted({size for sizes in by_size for size in sizes}):
+            for pid in set().union(*(sizes.get(size, ()) for sizes in by_size)):
+                common = _popcount(query_mask & masks[pid])
+                if common >= needed:
+                    # Containment ranks partial names well; Dice breaks ties in favour of closer lengths
+                    scored.append((common / n, 2 * common / (n + size), pid))
+                    top_hits += common == best_common
+            if top_hits >= limit:
+                break
+        return heapq.nlargest(limit, scored)
@@ -0,0 +1,169 @@
+"""
+On-demand profiling of script runs and actions.
+
+Profiling is off unless an admin arms it from the sidebar. The disarmed
+path is one dict lookup per run / action. Armed, the run or action is
+wrapped in cProfile and the result kept as a .prof file (readable with
+pstats, snakeviz, etc.) plus a text summary of the slowest functions and
+of time spent per library (python-docx, gspread / auth, Streamlit, ...).
+
+cProfile only sees the thread it is started on - the script thread - so
+background work (client warm-up) is not included.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import time
+from collections import deque
+
+SUMMARY_TOP_FUNCTIONS = 25
+
+# Path fragments -> label used in the per-library breakdown
+LIBRARY_LABELS = (
+    ("docx", "python-docx"),
+    ("gspread", "gspread"),
+    ("oauth2client", "google auth"),
+    ("google/auth", "google auth"),
+    ("googleapiclient", "google auth"),
+    ("google/generativeai", "gemini sdk"),
+    ("google/ai", "gemini sdk"),
+    ("grpc", "gemini sdk"),
+    ("streamlit", "streamlit"),
+    ("PIL", "pillow"),
+    ("lxml", "lxml"),
+)
+
+
+class ProfileSession:
+    """
+    Per-session profiling state: what is armed and the captured profiles.
+
+    Runs are armed by count ("profile the next N runs"); actions by name
+    ("profile the next export").
+    """
+
+    def __init__(self, keep=5):
+        """
+        Args:
+            keep (int): Captured profiles kept (oldest dropped)
+        """
+        self.runs_left = 0
+        self.actions = set()
+        self.captures = deque(maxlen=keep)
+        self._active = None  # (label, profile, started) of the run in progress
+
+    def arm(self, runs=0, actions=()):
+        self.runs_left = runs
+        self.actions = set(actions)
+
+    def start_run(self):
+        """Starts profiling this script run if runs are armed"""
+        self.finish_run(interrupted=True)  # Run that ended in st.rerun / st.stop
+        if not self.runs_left:
+            return
+        self.runs_left -= 1
+        self._active = ("run", _enable(), time.perf_counter())
+
+    def finish_run(self, interrupted=False):
+        """Stops profiling the current script run, if one is being profiled"""
+        if not self._active:
+            return
+        label, profile, started = self._active
+        self._active = None
+        if profile:
+            self._capture(label + (" (rerun)" if interrupted else ""), profile, started)
+
+    def action(self, name):
+        """
+        Context manager profiling one action if it is armed (then disarms it).
+
+        Args:
+            name (str): "generate", "accept" or "export"
+        """
+        return _ActionProfile(self, name if name in self.actions else None)
+
+    def _capture(self, label, profile, started):
+        profile.disable()
+        wall = time.perf_counter() - started
+        capture = {
+            "label": label,
+            "time": time.strftime("%Y%m%d_%H%M%S"),
+            "wall_s": wall,
+            "prof": marshal.dumps(pstats.Stats(profile).stats),
+            "summary": summarize(profile, wall),
+        }
+        self.captures.append(capture)
+        print(f"PROFILE: {label} took {wall:.2f}s\n{capture['summary']}")
+
+
+class _ActionProfile:
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        if self.name:
+            self.session.actions.discard(self.name)
+            self.profile = _enable()
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.name and self.profile:
+            self.session._capture(self.name, self.profile, self.started)
+        return False
+
+
+def _enable():
+    """Returns an enabled profiler, or None if another profiler is already running"""
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # Python 3.12+: one profiler per process at a time
+        print("PROFILE: skipped - another profile is in progress")
+        return None
+    return profile
+
+
+def summarize(profile, wall):
+    """
+    Returns a text summary: time per library, then the top functions by cumulative time.
+
+    Args:
+        profile (cProfile.Profile): Finished profile
+        wall (float): Wall time of the profiled span
+
+    Returns:
+        str: Summary text
+    """
+    stats = pstats.Stats(profile)
+
+    by_library = {}
+    for (filename, _, _), (_, _, own_time, _, _) in stats.stats.items():
+        label = _library(filename)
+        by_library[label] = by_library.get(label, 0.0) + own_time
+
+    out = io.StringIO()
+    out.write(f"Wall {wall:.3f}s, profiled {stats.total_tt:.3f}s\n\nTime by library (own time):\n")
+    for label, seconds in sorted(by_library.items(), key=lambda item: -item[1]):
+        out.write(f"  {label:<20} {seconds:8.3f}s\n")
+    out.write("\n")
+
+    stats.stream = out
+    stats.strip_dirs().sort_stats("cumulative").print_stats(SUMMARY_TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def _library(filename):
+    """Maps a profiled function's file to a library label"""
+    path = filename.replace(os.sep, "/")
+    if "site-packages" in path:
+        for fragment, label in LIBRARY_LABELS:
+            if f"/{fragment}/" in path:
+                return label
+        return "other libraries"
+    if "/lib/python" in path:
+        return "python stdlib"
+    return "app" if path.endswith(".py") else "builtins"
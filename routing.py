@@ -0,0 +1,145 @@
+import statistics
+import threading
+from collections import deque
+
+
+class ModelRouter:
+    """
+    Picks the model for each generation request.
+
+    Short write-ups go to the fast model as long as its rolling rule
+    compliance (word limit, no asterisks, no recommendation ending) and
+    latency hold up; long awards, long drafts and anything with a per-award
+    override go to the strong model. Statistics are kept per model over the last
+    `window` successful calls and shared by all sessions in the process.
+    """
+
+    def __init__(self, fast_model, strong_model, overrides=None, window=50,
+                 min_samples=5, min_compliance=0.9, max_latency_ratio=1.5,
+                 max_latency_s=20, strong_word_limit=150, long_draft_words=250,
+                 explore_every=10):
+        """
+        Args:
+            fast_model (str): Cheap, fast model (default choice)
+            strong_model (str): Slower, stronger model
+            overrides (dict): Award -> model, always used for that award
+            window (int): Calls kept per model for rolling statistics
+            min_samples (int): Calls needed before compliance is trusted
+            min_compliance (float): Fast model compliance needed to keep routing to it
+            max_latency_ratio (float): The fast model is benched when its median latency
+                                       exceeds the strong model's by this factor
+            max_latency_s (float): ... or exceeds this many seconds, unless the strong
+                                   model is slower still
+            strong_word_limit (int): Word limits at or above this use the strong model
+            long_draft_words (int): Drafts at or above this length use the strong model
+            explore_every (int): While the fast model is benched, every Nth request
+                                 still goes to it so its statistics can recover
+        """
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.overrides = dict(overrides or {})
+        self.min_samples = min_samples
+        self.min_compliance = min_compliance
+        self.max_latency_ratio = max_latency_ratio
+        self.max_latency_s = max_latency_s
+        self.strong_word_limit = strong_word_limit
+        self.long_draft_words = long_draft_words
+        self.explore_every = explore_every
+
+        self._lock = threading.Lock()
+        self._benched_requests = 0
+        self._latency = {m: deque(maxlen=window) for m in (fast_model, strong_model)}
+        self._compliant = {m: deque(maxlen=window) for m in (fast_model, strong_model)}
+
+    def choose(self, award="", word_limit=None, draft_words=0):
+        """
+        Returns the models to try, in order (the second one is the fallback).
+
+        Args:
+            award (str): Award name
+            word_limit (int): Target word count, if known
+            draft_words (int): Length of the clerk's draft
+
+        Returns:
+            list: Model names
+        """
+        primary = self._choose_primary(award, word_limit, draft_words)
+        fallback = self.strong_model if primary == self.fast_model else self.fast_model
+        return [primary, fallback]
+
+    def record(self, model, latency, compliant):
+        """
+        Records the outcome of a successful call.
+
+        Args:
+            model (str): Model that produced the text
+            latency (float): Seconds taken
+            compliant (bool): Whether the text passed the local rule checks
+        """
+        with self._lock:
+            if model not in self._latency:
+                return
+            self._latency[model].append(latency)
+            self._compliant[model].append(bool(compliant))
+
+    def stats(self):
+        """
+        Returns rolling statistics per model.
+
+        Returns:
+            dict: model -> {'samples', 'p50_latency_s', 'compliance'}
+        """
+        with self._lock:
+            return {
+                model: {
+                    "samples": len(self._latency[model]),
+                    "p50_latency_s": statistics.median(self._latency[model]) if self._latency[model] else None,
+                    "compliance": (sum(self._compliant[model]) / len(self._compliant[model])
+                                   if self._compliant[model] else None),
+                }
+                for model in self._latency
+            }
+
+    def _choose_primary(self, award, word_limit, draft_words):
+        if award in self.overrides:
+            return self.overrides[award]
+
+        if word_limit and word_limit >= self.strong_word_limit:
+            return self.strong_model
+        if draft_words >= self.long_draft_words:
+            return self.strong_model
+
+        with self._lock:
+            fast = list(self._compliant[self.fast_model])
+            strong = list(self._compliant[self.strong_model])
+            fast_latency = list(self._latency[self.fast_model])
+            strong_latency = list(self._latency[self.strong_model])
+
+        # Not enough evidence yet: use the fast model so evidence is gathered
+        if len(fast) < self.min_samples:
+            return self.fast_model
+
+        if not (self._too_slow(fast_latency, strong_latency) or self._non_compliant(fast, strong)):
+            return self.fast_model
+
+        with self._lock:
+            self._benched_requests += 1
+            explore = self.explore_every and self._benched_requests % self.explore_every == 0
+        return self.fast_model if explore else self.strong_model
+
+    def _non_compliant(self, fast, strong):
+        """Fast model is slipping on the rules and the strong one measurably does better"""
+        fast_rate = sum(fast) / len(fast)
+        if fast_rate >= self.min_compliance:
+            return False
+        return len(strong) < self.min_samples or sum(strong) / len(strong) > fast_rate
+
+    def _too_slow(self, fast_latency, strong_latency):
+        """Fast model's median latency is well above the strong model's, or above the ceiling"""
+        fast_p50 = statistics.median(fast_latency)
+        if len(strong_latency) < self.min_samples:
+            return bool(self.max_latency_s) and fast_p50 > self.max_latency_s
+        strong_p50 = statistics.median(strong_latency)
+        if self.max_latency_ratio and fast_p50 > self.max_latency_ratio * strong_p50:
+            return True
+        return bool(self.max_latency_s) and fast_p50 > self.max_latency_s and strong_p50 < fast_p50
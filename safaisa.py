@@ -0,0 +1,214 @@
+"""
+Headless command-line pipeline for SAFAISA.
+
+Runs the same prompt construction, generation, Word export and tracking
+sheet logic as the Streamlit app, without a browser:
+
+    python -m safaisa ingest   --input unit_docs/ month.zip --output nominations.jsonl
+    python -m safaisa generate --input nominations.csv --output results.jsonl --workers 4
+    python -m safaisa export   --input results.jsonl --output Award_Justifications.docx
+    python -m safaisa track    --input results.jsonl --credentials service_account.json
+
+Nominations are read from CSV or JSONL with the columns
+rank, name, award, draft and optionally id, preferred_name, role, unit,
+month, word_limit, ippt, bmi, atp, previous_awards.
+
+`ingest` turns unit .docx nominations (files, folders or zips) into a
+nominations JSONL for `generate`; check entries it flags before generating.
+
+Generation results are appended to the output JSONL as each one completes.
+Re-running the same command skips nominations that already have a
+successful result in the output file, so an interrupted run can be resumed.
+
+`generate` and `track` take --shared-state with the same URL as the app's
+SHARED_STATE_URL, so a batch run draws on the app's model quota and does
+not write tracking rows the app (or an earlier run) already wrote.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import core
+from core import generate_for_nomination, nomination_id
+from shared_state import open_shared_state
+
+
+# --- INPUT / OUTPUT ---
+def read_records(path):
+    """Reads nominations or results from a .csv or .jsonl file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            return [dict(row) for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_completed_ids(path):
+    """Returns ids that already have a successful result in an output file"""
+    if not os.path.exists(path):
+        return set()
+
+    completed = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # Partial line from an interrupted write
+            if not result.get("error"):
+                completed.add(result["id"])
+    return completed
+
+
+def successful_results(path):
+    """Returns the latest successful result per nomination id, in file order"""
+    results = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # Partial line from an interrupted write
+            if not result.get("error"):
+                results[result["id"]] = result
+    return list(results.values())
+
+
+def end_with_newline(path):
+    """Terminates a partial last line (interrupted write) so appended results start on their own line"""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+# --- COMMANDS ---
+def cmd_generate(args):
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        sys.exit("Error: set GEMINI_API_KEY or pass --api-key")
+    core.set_shared_state(open_shared_state(args.shared_state))
+
+    nominations = read_records(args.input)
+    completed = read_completed_ids(args.output)
+    pending = [n for n in nominations if nomination_id(n) not in completed]
+
+    print(f"{len(nominations)} nominations, {len(nominations) - len(pending)} already done, "
+          f"{len(pending)} to generate with {args.workers} workers", file=sys.stderr)
+
+    write_lock = threading.Lock()
+    failures = 0
+
+    end_with_newline(args.output)
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(generate_for_nomination, n, api_key): n for n in pending}
+
+        for future in as_completed(futures):
+            result = future.result()
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+            status = "FAILED" if result["error"] else "ok"
+            failures += bool(result["error"])
+            print(f"{status:>6}  {result['rank']} {result['name']} - {result['award']} "
+                  f"({result['elapsed_s']:.1f}s)", file=sys.stderr)
+
+    if failures:
+        print(f"{failures} nominations failed; re-run the same command to retry them", file=sys.stderr)
+        sys.exit(1)
+
+
+def cmd_ingest(args):
+    from ingest import ingest
+
+    sources = []
+    for path in args.input:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                sources.extend((os.path.join(root, n), os.path.join(root, n)) for n in sorted(names))
+        else:
+            sources.append((path, path))
+
+    count, flagged, failed = 0, 0, 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        for nomination in ingest(sources, workers=args.workers):
+            if nomination.get("error"):
+                failed += 1
+                print(f"FAILED  {nomination['source']}: {nomination['error']}", file=sys.stderr)
+                continue
+
+            out.write(json.dumps(nomination) + "\n")
+            count += 1
+            if nomination["warnings"]:
+                flagged += 1
+                print(f" CHECK  {nomination['source']}: {', '.join(nomination['warnings'])}", file=sys.stderr)
+
+    print(f"Wrote {count} nominations to {args.output} ({flagged} to check, {failed} unreadable)",
+          file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def cmd_export(args):
+    from utils import generate_docx
+
+    entries = successful_results(args.input)
+    with open(args.output, "wb") as f:
+        f.write(generate_docx(entries))
+    print(f"Exported {len(entries)} entries to {args.output}", file=sys.stderr)
+
+
+def cmd_track(args):
+    from utils import update_sheet
+
+    with open(args.credentials, encoding="utf-8") as f:
+        credentials = json.load(f)
+
+    update_sheet(successful_results(args.input), credentials=credentials,
+                 state=open_shared_state(args.shared_state))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="safaisa", description="SAFAISA headless pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Read unit .docx nominations into a nominations file")
+    ingest.add_argument("--input", required=True, nargs="+", help=".docx / .zip files or folders")
+    ingest.add_argument("--output", required=True, help="Nominations .jsonl to write")
+    ingest.add_argument("--workers", type=int, default=4, help="Documents parsed in parallel")
+    ingest.set_defaults(func=cmd_ingest)
+
+    generate = commands.add_parser("generate", help="Generate justifications for nominations")
+    generate.add_argument("--input", required=True, help="Nominations .csv or .jsonl")
+    generate.add_argument("--output", required=True, help="Results .jsonl (appended, used to resume)")
+    generate.add_argument("--workers", type=int, default=4, help="Concurrent generation calls")
+    generate.add_argument("--api-key", help="Gemini API key (default: $GEMINI_API_KEY)")
+    generate.add_argument("--shared-state", default="memory://", help="Shared state URL (as the app's)")
+    generate.set_defaults(func=cmd_generate)
+
+    export = commands.add_parser("export", help="Export results to a Word document")
+    export.add_argument("--input", required=True, help="Results .jsonl from generate")
+    export.add_argument("--output", required=True, help="Word document to write")
+    export.set_defaults(func=cmd_export)
+
+    track = commands.add_parser("track", help="Append results to the tracking sheet")
+    track.add_argument("--input", required=True, help="Results .jsonl from generate")
+    track.add_argument("--credentials", required=True, help="Service account JSON key file")
+    track.add_argument("--shared-state", default="memory://", help="Shared state URL (as the app's)")
+    track.set_defaults(func=cmd_track)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+import itertools
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from store import SessionStore
+
+
+# ============================================================================
+# SHARED STATE - What several app processes / hosts must agree on
+# ============================================================================
+# The response cache, the model rate-limit buckets and the queue of pending
+# tracking-sheet rows. With the in-memory backend (the default) this is per
+# process, exactly as before. The SQLite backend shares it between processes
+# on one host and also holds persisted versions and batches (it is a
+# SessionStore). A networked store (Redis, Postgres, ...) for replicas on
+# several hosts plugs in by implementing SharedState (and SessionStore's
+# methods, for batches) and adding its URL scheme to open_shared_state.
+
+class SharedState(ABC):
+    """
+    Interface of a shared-state backend.
+
+    Every method must be safe to call from many threads and, for shared
+    backends, many processes at once. Token taking and queue claiming must
+    be atomic in the backend (a transaction, a Lua script, SELECT ... FOR
+    UPDATE, etc.), not read-modify-write from the caller.
+    """
+
+    # --- Response cache ---
+    @abstractmethod
+    def cache_get(self, key):
+        """Returns the cached JSON-serialisable value for key, or None if absent / expired"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def cache_set(self, key, value, ttl):
+        """Stores a JSON-serialisable value for ttl seconds"""
+        raise NotImplementedError
+
+    # --- Rate limiting ---
+    @abstractmethod
+    def acquire_rate(self, bucket, per_minute, burst=None):
+        """
+        Takes one token from a token bucket.
+
+        Args:
+            bucket (str): Bucket name, e.g. "gemini:gemini-2.5-pro"
+            per_minute (float): Refill rate
+            burst (float): Bucket size (default: one minute's worth)
+
+        Returns:
+            float: 0 if a token was taken, else seconds until one is available
+        """
+        raise NotImplementedError
+
+    # --- Tracking sheet queue ---
+    @abstractmethod
+    def enqueue_sheet_rows(self, keyed_rows):
+        """
+        Queues rows for the tracking sheet.
+
+        Args:
+            keyed_rows (list): (idempotency key, row) pairs; a key that was
+                               already queued (pending or written) is ignored
+
+        Returns:
+            int: Rows newly queued
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_sheet_rows(self, owner, lease_seconds, limit=100, max_attempts=None):
+        """
+        Leases pending rows to one writer.
+
+        Rows whose lease has expired (a writer that died mid-write) or that
+        were released after a failed write can be claimed again. Such a row
+        is claimed on its own, so a row the sheet rejects cannot fail the
+        rows queued after it; after max_attempts claims it is marked failed
+        (and logged) instead of being retried forever.
+
+        Returns:
+            list: (row id, row) pairs, oldest first
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete_sheet_rows(self, owner, row_ids):
+        """Marks leased rows as written"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_sheet_rows(self, owner, row_ids):
+        """Returns leased rows to the queue after a failed write"""
+        raise NotImplementedError
+
+
+def _claimable(rows, limit):
+    """
+    Picks the rows to lease from (id, row, attempts) candidates, oldest first.
+
+    A row tried before is leased on its own, so a row the sheet rejects is
+    retried (and eventually failed) without the rows queued after it.
+
+    Returns:
+        list: (id, row) pairs
+    """
+    if rows and rows[0][2]:
+        return [rows[0][:2]]
+    batch = []
+    for row_id, row, attempts in rows[:limit]:
+        if attempts:
+            break
+        batch.append((row_id, row))
+    return batch
+
+
+def _log_failed_row(row, attempts):
+    print(f"WARNING: Giving up on tracking row after {attempts} failed writes, add it by hand: {row}")
+
+
+def _refill(tokens, updated, now, per_minute, burst):
+    """Token bucket step shared by the backends: returns (tokens after, wait seconds)"""
+    tokens = min(burst, tokens + (now - updated) * per_minute / 60)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) * 60 / per_minute
+
+
+class MemorySharedState(SharedState):
+    """Per-process backend (the default): correct for one process, shares nothing beyond it"""
+
+    def __init__(self, written_keep_days=30):
+        """
+        Args:
+            written_keep_days (int): Days a written row's key is remembered
+                                     (the window in which re-queues are ignored)
+        """
+        self.written_keep_days = written_keep_days
+        self._lock = threading.Lock()
+        self._cache = {}      # key -> (value, expires)
+        self._buckets = {}    # bucket -> (tokens, updated)
+        self._sheet_rows = {}  # id -> {"key", "row", "owner", "lease_until"} while pending
+        self._sheet_keys = {}  # key -> time written (or failed), None while pending
+        self._sheet_ids = itertools.count(1)
+
+    def cache_get(self, key):
+        with self._lock:
+            value, expires = self._cache.get(key, (None, 0))
+            return value if expires > time.time() else None
+
+    def cache_set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            self._cache = {k: v for k, v in self._cache.items() if v[1] > now}
+            self._cache[key] = (value, now + ttl)
+
+    def acquire_rate(self, bucket, per_minute, burst=None):
+        burst = burst or per_minute
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(bucket, (burst, now))
+            tokens, wait = _refill(tokens, updated, now, per_minute, burst)
+            self._buckets[bucket] = (tokens, now)
+            return wait
+
+    def enqueue_sheet_rows(self, keyed_rows):
+        added = 0
+        with self._lock:
+            for key, row in keyed_rows:
+                if key in self._sheet_keys:
+                    continue
+                self._sheet_keys[key] = None
+                self._sheet_rows[next(self._sheet_ids)] = {"key": key, "row": row, "owner": None,
+                                                           "lease_until": 0, "attempts": 0}
+                added += 1
+        return added
+
+    def claim_sheet_rows(self, owner, lease_seconds, limit=100, max_attempts=None):
+        with self._lock:
+            now = time.time()
+            forget_before = now - self.written_keep_days * 86400
+            self._sheet_keys = {k: written for k, written in self._sheet_keys.items()
+                                if written is None or written >= forget_before}
+            available = [(row_id, item) for row_id, item in sorted(self._sheet_rows.items())
+                         if item["lease_until"] < now]
+            for row_id, item in available:
+                if max_attempts and item["attempts"] >= max_attempts:
+                    _log_failed_row(item["row"], item["attempts"])
+                    # The key is kept like a written one, so the row is not queued again
+                    self._sheet_keys[self._sheet_rows.pop(row_id)["key"]] = now
+            available = _claimable([(row_id, item, item["attempts"]) for row_id, item in available
+                                    if row_id in self._sheet_rows], limit)
+            for row_id, item in available:
+                item["owner"], item["lease_until"] = owner, now + lease_seconds
+                item["attempts"] += 1
+            return [(row_id, item["row"]) for row_id, item in available]
+
+    def complete_sheet_rows(self, owner, row_ids):
+        with self._lock:
+            now = time.time()
+            for row_id in row_ids:
+                if self._sheet_rows.get(row_id, {}).get("owner") == owner:
+                    # The key stays in _sheet_keys for written_keep_days, so it is not re-queued
+                    self._sheet_keys[self._sheet_rows.pop(row_id)["key"]] = now
+
+    def release_sheet_rows(self, owner, row_ids):
+        with self._lock:
+            for row_id in row_ids:
+                item = self._sheet_rows.get(row_id)
+                if item and item["owner"] == owner:
+                    item["owner"], item["lease_until"] = None, 0
+
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sheet_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    row TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    written REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sheet_queue_pending ON sheet_queue (status, id);
+"""
+
+
+class SQLiteSharedState(SessionStore, SharedState):
+    """
+    Backend for several app processes on one host (one SQLite file, WAL mode).
+
+    Also a SessionStore, so persisted versions and batches live in the same
+    file. Token buckets and queue claims run in BEGIN IMMEDIATE transactions,
+    which SQLite serialises across processes.
+    """
+
+    def __init__(self, path, written_keep_days=30):
+        """
+        Args:
+            path (str): SQLite database file
+            written_keep_days (int): Days a written row's key is remembered
+                                     (the window in which re-queues are ignored)
+        """
+        super().__init__(path)
+        self.written_keep_days = written_keep_days
+        with self._lock:
+            self._conn.executescript(SHARED_SCHEMA)
+            self._conn.commit()
+
+    def _transaction(self, func):
+        """Runs func(connection) in a write transaction taken up front (atomic across processes)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+            return result
+
+    # --- Response cache ---
+    def cache_get(self, key):
+        rows = self._read("SELECT value FROM response_cache WHERE key = ? AND expires > ?", (key, time.time()))
+        return json.loads(rows[0][0]) if rows else None
+
+    def cache_set(self, key, value, ttl):
+        def write(conn):
+            now = time.time()
+            conn.execute("DELETE FROM response_cache WHERE expires <= ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO response_cache (key, value, expires) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), now + ttl))
+        self._transaction(write)
+
+    # --- Rate limiting ---
+    def acquire_rate(self, bucket, per_minute, burst=None):
+        burst = burst or per_minute
+
+        def take(conn):
+            now = time.time()  # Wall clock: buckets are shared between processes
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens, wait = _refill(*(row or (burst, now)), now, per_minute, burst)
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                         (bucket, tokens, now))
+            return wait
+        return self._transaction(take)
+
+    # --- Tracking sheet queue ---
+    def enqueue_sheet_rows(self, keyed_rows):
+        def insert(conn):
+            added = 0
+            for key, row in keyed_rows:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO sheet_queue (key, row, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(row), time.time())
+                )
+                added += cursor.rowcount
+            return added
+        return self._transaction(insert)
+
+    def claim_sheet_rows(self, owner, lease_seconds, limit=100, max_attempts=None):
+        def claim(conn):
+            now = time.time()
+            conn.execute("DELETE FROM sheet_queue WHERE status IN ('written', 'failed') AND written < ?",
+                         (now - self.written_keep_days * 86400,))
+            if max_attempts:
+                failed = conn.execute(
+                    "SELECT id, row, attempts FROM sheet_queue "
+                    "WHERE status = 'pending' AND lease_until < ? AND attempts >= ?",
+                    (now, max_attempts)
+                ).fetchall()
+                for _, row, attempts in failed:
+                    _log_failed_row(json.loads(row), attempts)
+                # written holds the time the row was settled; the key is kept like a written one
+                conn.executemany("UPDATE sheet_queue SET status = 'failed', written = ? WHERE id = ?",
+                                 [(now, row_id) for row_id, _, _ in failed])
+            rows = _claimable(conn.execute(
+                "SELECT id, row, attempts FROM sheet_queue WHERE status = 'pending' AND lease_until < ? "
+                "ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall(), limit)
+            conn.executemany(
+                "UPDATE sheet_queue SET owner = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(owner, now + lease_seconds, row_id) for row_id, _ in rows]
+            )
+            return [(row_id, json.loads(row)) for row_id, row in rows]
+        return self._transaction(claim)
+
+    def complete_sheet_rows(self, owner, row_ids):
+        self._transaction(lambda conn: conn.executemany(
+            "UPDATE sheet_queue SET status = 'written', written = ? WHERE id = ? AND owner = ?",
+            [(time.time(), row_id, owner) for row_id in row_ids]
+        ))
+
+    def release_sheet_rows(self, owner, row_ids):
+        self._transaction(lambda conn: conn.executemany(
+            "UPDATE sheet_queue SET lease_until = 0 WHERE id = ? AND owner = ? AND status = 'pending'",
+            [(row_id, owner) for row_id in row_ids]
+        ))
+
+    # Versions and batches: inherited from SessionStore
+
+
+def open_shared_state(url):
+    """
+    Opens the shared-state backend for a URL.
+
+    Args:
+        url (str): "memory://" (per process) or "sqlite:///path/to/file.db"
+
+    Returns:
+        SharedState: Backend instance
+    """
+    if url in ("", "memory://"):
+        return MemorySharedState()
+    if url.startswith("sqlite:///"):
+        return SQLiteSharedState(url[len("sqlite:///"):])
+    raise ValueError(
+        f"Unsupported shared state URL '{url}' - use memory:// or sqlite:///path, "
+        "or add a SharedState implementation for this store"
+    )
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one upstream call.
+
+    The first caller for a key runs the function; every other caller with
+    the same key waits on the same future and receives the same result (or
+    exception). A successful result also lingers for `linger` seconds after
+    completion, which catches re-clicks that arrive just after the first
+    call returned - in Streamlit the re-click reruns the script only once
+    the blocking call has finished.
+    """
+
+    def __init__(self, linger=0.0):
+        """
+        Args:
+            linger (float): Seconds a finished result keeps being shared
+        """
+        self.linger = linger
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (future, expires_at or None while in flight)
+        self._counts = {"calls": 0, "upstream": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key, func):
+        """
+        Runs func once per key at a time.
+
+        Args:
+            key (hashable): Identity of the call (e.g. prompt + model settings)
+            func (callable): Zero-argument function doing the upstream call
+
+        Returns:
+            The result of func, possibly from another caller's call
+        """
+        with self._lock:
+            self._counts["calls"] += 1
+            entry = self._calls.get(key)
+            if entry and entry[1] is not None and entry[1] < time.monotonic():
+                entry = None
+
+            if entry:
+                self._counts["coalesced"] += 1
+                future, leader = entry[0], False
+            else:
+                self._counts["upstream"] += 1
+                future, leader = Future(), True
+                self._calls[key] = (future, None)
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                self._counts["errors"] += 1
+                self._calls.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self.linger > 0:
+                self._calls[key] = (future, time.monotonic() + self.linger)
+            else:
+                self._calls.pop(key, None)
+            self._purge_expired()
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        """
+        Returns call counters.
+
+        Returns:
+            dict: calls, upstream (calls actually made), coalesced, errors
+                  and in_flight
+        """
+        with self._lock:
+            stats = dict(self._counts)
+            stats["in_flight"] = sum(1 for _, expires in self._calls.values() if expires is None)
+        return stats
+
+    def _purge_expired(self):
+        """Drops lingering results past their expiry (lock must be held)"""
+        now = time.monotonic()
+        expired = [k for k, (_, expires) in self._calls.items() if expires is not None and expires < now]
+        for k in expired:
+            del self._calls[k]
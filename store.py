@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+# ============================================================================
+# SESSION PERSISTENCE - Batches and versions survive sleeps and restarts
+# ============================================================================
+# Every generated version and accepted batch entry is written as its own
+# small row as soon as it is created, so nothing is lost when the host
+# sleeps, restarts or the tab reloads. SQLite runs in write-ahead logging
+# mode so these incremental writes are cheap and never block readers.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_versions_user ON versions (user, id);
+
+CREATE TABLE IF NOT EXISTS batch (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batch_user ON batch (user, id);
+"""
+
+
+class SessionStore:
+    """
+    Per-user store of generated versions and the pending export batch.
+
+    One instance is shared by every session in the process; all access goes
+    through a single connection guarded by a lock.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _write(self, sql, params=()):
+        """Runs a single write statement in its own transaction"""
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- Versions ---
+    def add_version(self, user, subject, text):
+        """
+        Records a newly generated version.
+
+        Args:
+            user (str): Clerk identifier
+            subject (dict): Nominee metadata
+            text (str): Justification text
+
+        Returns:
+            int: Version id (used as the VersionHistory vid)
+        """
+        return self._write(
+            "INSERT INTO versions (user, subject, text, created) VALUES (?, ?, ?, ?)",
+            (user, json.dumps(subject), text, time.time())
+        )
+
+    def update_version_text(self, user, vid, text):
+        """Saves a clerk's edit of an existing version"""
+        self._write(
+            "UPDATE versions SET text = ? WHERE user = ? AND id = ?",
+            (text, user, vid)
+        )
+
+    def load_versions(self, user, limit):
+        """
+        Returns the most recent versions of a user, oldest first.
+
+        Returns:
+            list: (vid, subject dict, text) tuples
+        """
+        rows = self._read(
+            "SELECT id, subject, text FROM versions WHERE user = ? ORDER BY id DESC LIMIT ?",
+            (user, limit)
+        )
+        return [(vid, json.loads(subject), text) for vid, subject, text in reversed(rows)]
+
+    def prune_versions(self, user, keep):
+        """Deletes all but the latest `keep` versions of a user"""
+        self._write(
+            """DELETE FROM versions WHERE user = ? AND id NOT IN (
+                   SELECT id FROM versions WHERE user = ? ORDER BY id DESC LIMIT ?)""",
+            (user, user, keep)
+        )
+
+    # --- Batch ---
+    def add_batch_entry(self, user, entry):
+        """Records an accepted entry waiting for export"""
+        self._write(
+            "INSERT INTO batch (user, entry, created) VALUES (?, ?, ?)",
+            (user, json.dumps(entry), time.time())
+        )
+
+    def load_batch(self, user):
+        """Returns the pending batch of a user in acceptance order"""
+        rows = self._read("SELECT entry FROM batch WHERE user = ? ORDER BY id", (user,))
+        return [json.loads(entry) for (entry,) in rows]
+
+    def clear_batch(self, user):
+        """Removes the pending batch of a user (after export or Clear Batch)"""
+        self._write("DELETE FROM batch WHERE user = ?", (user,))
@@ -0,0 +1,38 @@
+from nominee_index import NomineeIndex
+
+
+def make_index(rows, **kwargs):
+    index = NomineeIndex(**kwargs)
+    index.add_rows(rows)
+    return index
+
+
+def test_exact_name_ranks_first_with_its_awards():
+    index = make_index([
+        ["CPL", "TAN AH KOW", "Alpha COY", "CO Coin", "January 2026", "PRESENTED"],
+        ["CPL", "TAN AH KOW", "Alpha COY", "RSM Coin", "March 2026", "PRESENTED"],
+        ["LCP", "TAN AH KOWI", "Bravo COY", "CO Coin", "January 2026", "PRESENTED"],
+    ])
+    best = index.search("tan ah-kow")[0]
+    assert (best["name"], best["previous_awards"]) == ("TAN AH KOW", "CO Coin, RSM Coin")
+
+
+def test_excluded_statuses_are_not_previous_awards():
+    index = make_index([
+        ["CPL", "LIM WEI", "Alpha COY", "CO Coin", "January 2026", "PRESENTED"],
+        ["CPL", "LIM WEI", "Alpha COY", "RSM Coin", "March 2026", "NOMINATED"],
+    ], exclude_statuses=("NOMINATED",))
+    assert index.search("LIM WEI")[0]["previous_awards"] == "CO Coin"
+
+
+def test_common_surname_returns_shortest_full_matches():
+    rows = [["CPL", f"TAN {'X' * (i % 7)} {i:04d}", "", "", "", ""] for i in range(3000)]
+    rows.append(["CPL", "TAN", "", "", "", ""])
+    results = make_index(rows).search("TAN", limit=3)
+    assert [r["score"] for r in results] == [1.0, 1.0, 1.0]
+    assert results[0]["name"] == "TAN"
+
+
+def test_misspelt_name_still_found():
+    index = make_index([["CPL", "MUHAMMAD HAFIZ", "", "", "", ""], ["CPL", "KUMAR ARJUN", "", "", "", ""]])
+    assert index.search("MUHAMAD HAFIS")[0]["name"] == "MUHAMMAD HAFIZ"
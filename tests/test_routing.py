@@ -0,0 +1,60 @@
+from routing import ModelRouter
+
+
+def make_router(**kwargs):
+    return ModelRouter("flash", "pro", explore_every=0, **kwargs)
+
+
+def record(router, model, latency, compliant=True, times=5):
+    for _ in range(times):
+        router.record(model, latency, compliant)
+
+
+def test_fast_model_by_default():
+    assert make_router().choose() == ["flash", "pro"]
+
+
+def test_long_inputs_and_overrides_use_strong_model():
+    router = make_router(overrides={"BSOM": "pro"})
+    assert router.choose(award="BSOM")[0] == "pro"
+    assert router.choose(word_limit=150)[0] == "pro"
+    assert router.choose(draft_words=300)[0] == "pro"
+
+
+def test_non_compliant_fast_model_is_benched():
+    router = make_router()
+    record(router, "flash", 1, compliant=False)
+    assert router.choose()[0] == "pro"
+
+
+def test_fast_model_kept_when_strong_model_is_no_better():
+    router = make_router()
+    record(router, "flash", 1, compliant=False)
+    record(router, "pro", 1, compliant=False)
+    assert router.choose()[0] == "flash"
+
+
+def test_fast_model_benched_when_slower_than_strong_model():
+    router = make_router(max_latency_ratio=1.5)
+    record(router, "flash", 4)
+    record(router, "pro", 2)
+    assert router.choose()[0] == "pro"
+
+
+def test_fast_model_benched_above_latency_ceiling():
+    router = make_router(max_latency_s=20)
+    record(router, "flash", 25)
+    assert router.choose()[0] == "pro"
+
+
+def test_ceiling_ignored_when_strong_model_is_slower():
+    router = make_router(max_latency_s=20)
+    record(router, "flash", 25)
+    record(router, "pro", 40)
+    assert router.choose()[0] == "flash"
+
+
+def test_benched_fast_model_is_still_explored():
+    router = ModelRouter("flash", "pro", explore_every=3)
+    record(router, "flash", 1, compliant=False)
+    assert [router.choose()[0] for _ in range(3)] == ["pro", "pro", "flash"]
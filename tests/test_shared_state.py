@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from shared_state import MemorySharedState, SQLiteSharedState, SharedState, open_shared_state
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+    if request.param == "memory":
+        return MemorySharedState()
+    return SQLiteSharedState(str(tmp_path / "shared.db"))
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SharedState()
+
+
+def test_enqueue_ignores_known_keys(state):
+    assert state.enqueue_sheet_rows([("a", ["1"]), ("b", ["2"]), ("a", ["1"])]) == 2
+    assert state.enqueue_sheet_rows([("b", ["2"])]) == 0
+
+
+def test_claim_leases_rows_to_one_owner(state):
+    state.enqueue_sheet_rows([("a", ["1"]), ("b", ["2"]), ("c", ["3"])])
+
+    first = state.claim_sheet_rows("w1", lease_seconds=60, limit=2)
+    assert [row for _, row in first] == [["1"], ["2"]]
+    second = state.claim_sheet_rows("w2", lease_seconds=60)
+    assert [row for _, row in second] == [["3"]]
+    assert state.claim_sheet_rows("w3", lease_seconds=60) == []
+
+
+def test_expired_lease_can_be_claimed_again(state):
+    state.enqueue_sheet_rows([("a", ["1"])])
+    state.claim_sheet_rows("dead", lease_seconds=0.01)
+    time.sleep(0.02)
+
+    assert [row for _, row in state.claim_sheet_rows("w2", lease_seconds=60)] == [["1"]]
+
+
+def test_complete_removes_rows_and_keeps_keys(state):
+    state.enqueue_sheet_rows([("a", ["1"])])
+    claimed = state.claim_sheet_rows("w1", lease_seconds=0.01)
+    state.complete_sheet_rows("w1", [row_id for row_id, _ in claimed])
+    time.sleep(0.02)
+
+    assert state.claim_sheet_rows("w2", lease_seconds=60) == []
+    assert state.enqueue_sheet_rows([("a", ["1"])]) == 0
+
+
+def test_complete_by_other_owner_is_ignored(state):
+    state.enqueue_sheet_rows([("a", ["1"])])
+    claimed = state.claim_sheet_rows("w1", lease_seconds=0.01)
+    state.complete_sheet_rows("w2", [row_id for row_id, _ in claimed])
+    time.sleep(0.02)
+
+    assert [row for _, row in state.claim_sheet_rows("w3", lease_seconds=60)] == [["1"]]
+
+
+def test_release_returns_rows_to_queue(state):
+    state.enqueue_sheet_rows([("a", ["1"])])
+    claimed = state.claim_sheet_rows("w1", lease_seconds=60)
+    state.release_sheet_rows("w2", [row_id for row_id, _ in claimed])
+    assert state.claim_sheet_rows("w3", lease_seconds=60) == []
+
+    state.release_sheet_rows("w1", [row_id for row_id, _ in claimed])
+    assert [row for _, row in state.claim_sheet_rows("w3", lease_seconds=60)] == [["1"]]
+
+
+def test_written_keys_expire(state):
+    state.written_keep_days = 0
+    state.enqueue_sheet_rows([("a", ["1"])])
+    claimed = state.claim_sheet_rows("w1", lease_seconds=60)
+    state.complete_sheet_rows("w1", [row_id for row_id, _ in claimed])
+    time.sleep(0.01)
+    state.claim_sheet_rows("w1", lease_seconds=60)  # Forgets expired keys
+
+    assert state.enqueue_sheet_rows([("a", ["1"])]) == 1
+
+
+def test_pending_keys_do_not_expire(state):
+    state.written_keep_days = 0
+    state.enqueue_sheet_rows([("a", ["1"])])
+    state.claim_sheet_rows("w1", lease_seconds=60)
+
+    assert state.enqueue_sheet_rows([("a", ["1"])]) == 0
+
+
+def test_cache_expires(state):
+    state.cache_set("k", {"text": "v"}, ttl=0.05)
+    assert state.cache_get("k") == {"text": "v"}
+    time.sleep(0.06)
+    assert state.cache_get("k") is None
+
+
+def test_acquire_rate_waits_when_bucket_is_empty(state):
+    assert state.acquire_rate("gemini:test", per_minute=60, burst=1) == 0
+    assert 0 < state.acquire_rate("gemini:test", per_minute=60, burst=1) <= 1
+
+
+def test_open_shared_state(tmp_path):
+    assert isinstance(open_shared_state("memory://"), MemorySharedState)
+    assert isinstance(open_shared_state(f"sqlite:///{tmp_path / 'shared.db'}"), SQLiteSharedState)
+    with pytest.raises(ValueError):
+        open_shared_state("redis://localhost")
+
+
+def fail_write(state, owner="w1", max_attempts=None):
+    claimed = state.claim_sheet_rows(owner, lease_seconds=60, max_attempts=max_attempts)
+    state.release_sheet_rows(owner, [row_id for row_id, _ in claimed])
+    return [row for _, row in claimed]
+
+
+def test_retried_row_is_claimed_on_its_own(state):
+    state.enqueue_sheet_rows([("a", ["1"]), ("b", ["2"])])
+    assert fail_write(state) == [["1"], ["2"]]
+
+    assert fail_write(state) == [["1"]]
+    claimed = state.claim_sheet_rows("w1", lease_seconds=60)
+    assert [row for _, row in claimed] == [["1"]]
+    state.complete_sheet_rows("w1", [row_id for row_id, _ in claimed])
+
+    state.enqueue_sheet_rows([("c", ["3"]), ("d", ["4"])])
+    assert [row for _, row in state.claim_sheet_rows("w1", lease_seconds=60)] == [["2"]]
+    assert [row for _, row in state.claim_sheet_rows("w1", lease_seconds=60)] == [["3"], ["4"]]
+
+
+def test_row_failing_every_write_is_dropped(state, capsys):
+    state.enqueue_sheet_rows([("bad", ["1"])])
+    for _ in range(3):
+        assert fail_write(state, max_attempts=3) == [["1"]]
+    state.enqueue_sheet_rows([("good", ["2"])])
+
+    claimed = state.claim_sheet_rows("w1", lease_seconds=60, max_attempts=3)
+    assert [row for _, row in claimed] == [["2"]]
+    assert "Giving up on tracking row after 3 failed writes" in capsys.readouterr().out
+    assert state.enqueue_sheet_rows([("bad", ["1"])]) == 0
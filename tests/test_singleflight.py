@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "text"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", upstream)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", upstream))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert results == ["text"] * 4
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert (stats["calls"], stats["upstream"], stats["coalesced"], stats["in_flight"]) == (4, 1, 3, 0)
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["upstream"] == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight(linger=60)
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("quota")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ["quota", "quota"]
+    assert flight.stats()["errors"] == 1
+    assert flight.do("k", lambda: "retried") == "retried"
+
+
+def test_result_lingers_then_expires():
+    flight = SingleFlight(linger=0.05)
+    assert flight.do("k", lambda: "first") == "first"
+    assert flight.do("k", lambda: "second") == "first"
+    time.sleep(0.06)
+    assert flight.do("k", lambda: "third") == "third"
+
+
+def test_no_linger_runs_again():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_exception_propagates_to_leader():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: (_ for _ in ()).throw(ValueError("bad")))
@@ -1,11 +1,17 @@
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 from io import BytesIO
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import hashlib
+import os
+import socket
+import threading
 import streamlit as st
 from datetime import datetime
+from clients import get_worksheet
+
+# GOOGLE SHEETS CONFIGURATION
+SPREADSHEET_NAME = "NS AWARDS TRACKING"
+WORKSHEET_NAME = "Sheet1"
+SHEET_WRITE_LEASE_SECONDS = 120  # Queued rows claimed by a writer that dies are retried after this
+SHEET_MAX_WRITE_ATTEMPTS = 5     # A queued row that fails this many writes is logged and dropped
 
 
 def generate_docx(items):
@@ -22,6 +28,11 @@ def generate_docx(items):
     Returns:
         bytes: Word document as bytes for download
     """
+    # python-docx is imported on first export to keep app start-up fast
+    from docx import Document
+    from docx.shared import Inches, Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
     doc = Document()
     
     # Set narrow margins for better page utilization
@@ -161,7 +172,92 @@ def generate_docx(items):
     return bio.getvalue()
 
 
-def update_sheet(items):
+def build_tracking_rows(items):
+    """
+    Builds tracking sheet rows for accepted entries.
+    
+    Citation entries are skipped (they don't need separate tracking).
+    
+    Args:
+        items: List of dictionaries with keys: 
+               'rank', 'name', 'unit', 'award', 'month'
+    
+    Returns:
+        list: One row per entry, in the column order of the tracking sheet
+    """
+    rows = []
+    for item in items:
+        # Skip citation entries (they don't need separate tracking)
+        if "(CITATION)" in item.get('name', ''):
+            continue
+        
+        # Prepare row data according to tracking format
+        rows.append([
+            item.get('rank', ''),                    # Column A: RANK
+            item.get('name', ''),                    # Column B: NAME
+            item.get('unit', ''),                    # Column C: COY/NODE
+            item.get('award', ''),                   # Column D: AWARD
+            item.get('month', ''),                   # Column E: MONTH OF AWARD
+            "NOMINATED",                             # Column F: STATUS (default)
+            ""                                       # Column G: PRESENTATION DATE (empty)
+        ])
+    return rows
+
+
+def fetch_tracking_rows(credentials, start_row=1):
+    """
+    Reads tracking sheet rows from start_row (1-based) to the end.
+    
+    Used to build the nominee index; only rows after start_row are
+    transferred, so refreshes after the first load are small.
+    
+    Args:
+        credentials: Service account credentials dict
+        start_row: First sheet row to read (1 includes the header row)
+    
+    Returns:
+        list: Rows in the column order of the tracking sheet
+    """
+    sheet = get_worksheet(credentials, SPREADSHEET_NAME, WORKSHEET_NAME)
+    if start_row <= 1:
+        return sheet.get_all_values()
+    return list(sheet.get(f"A{start_row}:G"))
+
+
+def tracking_row_key(row):
+    """Idempotency key of a tracking row: the same nomination is only written once"""
+    return hashlib.sha1("|".join(str(v).strip().upper() for v in row[:5]).encode("utf-8")).hexdigest()
+
+
+def _flush_sheet_queue(sheet, state):
+    """
+    Writes queued tracking rows, including rows left behind by other processes.
+
+    Rows are leased before writing, so two processes flushing at once never
+    append the same row; rows of a failed write are released for a retry.
+
+    Returns:
+        int: Rows written
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    written = 0
+    while True:
+        claimed = state.claim_sheet_rows(owner, SHEET_WRITE_LEASE_SECONDS, max_attempts=SHEET_MAX_WRITE_ATTEMPTS)
+        if not claimed:
+            return written
+        row_ids = [row_id for row_id, _ in claimed]
+        try:
+            sheet.append_rows([row for _, row in claimed])
+        except BaseException:
+            state.release_sheet_rows(owner, row_ids)
+            raise
+        state.complete_sheet_rows(owner, row_ids)
+        for _, row_data in claimed:
+            print(f"✓ Added to tracking: {row_data[0]} {row_data[1]}")
+        written += len(claimed)
+
+
+def update_sheet(items, credentials=None, state=None):
     """
     Updates Google Sheet with award tracking information.
     
@@ -171,6 +267,12 @@ def update_sheet(items):
     Args:
         items: List of dictionaries with keys: 
                'rank', 'name', 'unit', 'award', 'month'
+        credentials: Service account credentials dict. If omitted,
+                     'gcp_service_account' from Streamlit secrets is used.
+        state: Optional shared state backend (see shared_state). Rows are
+               queued there first, so each nomination is written once even
+               if several app processes accept it, and rows from a failed
+               write are retried by the next update from any process.
     
     Google Sheet Structure:
     - Column A: RANK
@@ -185,63 +287,36 @@ def update_sheet(items):
         Requires 'gcp_service_account' credentials in Streamlit secrets.
         The Google Sheet must be shared with the service account email.
     """
-    try:
-        # GOOGLE SHEETS CONFIGURATION
-        SPREADSHEET_NAME = "NS AWARDS TRACKING"
-        WORKSHEET_NAME = "Sheet1" 
+    # gspread is imported on first sheet write to keep app start-up fast
+    import gspread
 
-        
+    try:
         # Check if Google Cloud credentials exist
-        if "gcp_service_account" not in st.secrets:
-            print("INFO: Skipping sheet update - No GCP credentials in secrets.toml")
-            return
+        if credentials is None:
+            if "gcp_service_account" not in st.secrets:
+                print("INFO: Skipping sheet update - No GCP credentials in secrets.toml")
+                return
+            credentials = st.secrets["gcp_service_account"]
         
-        # Define required scopes for Google Sheets and Drive access
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
-        # Authenticate using service account from Streamlit secrets
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(
-            st.secrets["gcp_service_account"],
-            scope
-        )
-        client = gspread.authorize(creds)
-        
-        # Open the target spreadsheet and worksheet
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        
-        # Option 1: Open by worksheet name
-        try:
-            sheet = spreadsheet.worksheet(WORKSHEET_NAME)
-        except:
-            # Option 2: Use first sheet if name not found
-            sheet = spreadsheet.sheet1
+        # Authorized worksheet is cached per process (see clients.get_worksheet)
+        sheet = get_worksheet(credentials, SPREADSHEET_NAME, WORKSHEET_NAME)
         
+        rows = build_tracking_rows(items)
+        if state is not None:
+            # Queue, then write whatever is pending (leased, so no process writes a row twice)
+            state.enqueue_sheet_rows([(tracking_row_key(row), row) for row in rows])
+            written = _flush_sheet_queue(sheet, state)
+            print(f"SUCCESS: Added {written} entries to Google Sheet")
+            return
+
         # Append each entry as a new row
-        for item in items:
-            # Skip citation entries (they don't need separate tracking)
-            if "(CITATION)" in item.get('name', ''):
-                continue
-            
-            # Prepare row data according to tracking format
-            row_data = [
-                item.get('rank', ''),                    # Column A: RANK
-                item.get('name', ''),                    # Column B: NAME
-                item.get('unit', ''),                    # Column C: COY/NODE
-                item.get('award', ''),                   # Column D: AWARD
-                item.get('month', ''),                   # Column E: MONTH OF AWARD
-                "NOMINATED",                             # Column F: STATUS (default)
-                ""                                       # Column G: PRESENTATION DATE (empty)
-            ]
-            
+        for row_data in rows:
             # Append the row to the sheet
             sheet.append_row(row_data)
             
-            print(f"✓ Added to tracking: {item.get('rank')} {item.get('name')}")
+            print(f"✓ Added to tracking: {row_data[0]} {row_data[1]}")
         
-        print(f"SUCCESS: Added {len([i for i in items if '(CITATION)' not in i.get('name', '')])} entries to Google Sheet")
+        print(f"SUCCESS: Added {len(rows)} entries to Google Sheet")
         
     except gspread.exceptions.SpreadsheetNotFound:
         error_msg = f"ERROR: Spreadsheet '{SPREADSHEET_NAME}' not found. Please check the name."